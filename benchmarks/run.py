@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Scale benchmarks for the git accoutrements commands.
+
+Synthetic bare "remote" repositories and clones are built locally at the requested sizes, each command is then timed
+end to end and the git processes that it spawns are counted (using a `git` shim placed at the front of the PATH). The
+results are written as JSON so that they can be compared between releases:
+
+    $ python benchmarks/run.py --branches 10,1000 --remotes 1,3 --checkouts 100 --output before.json
+    $ python benchmarks/run.py --branches 10,1000 --remotes 1,3 --checkouts 100 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_ROOT = os.path.join(ROOT, 'src')
+
+GIT_SHIM = """#!/bin/sh
+echo "$*" >> "$ACCOUTREMENTS_BENCH_GIT_LOG"
+exec "{git}" "$@"
+"""
+
+GIT_IDENTITY = {
+    'GIT_AUTHOR_NAME': 'bench',
+    'GIT_AUTHOR_EMAIL': 'bench@example.com',
+    'GIT_COMMITTER_NAME': 'bench',
+    'GIT_COMMITTER_EMAIL': 'bench@example.com',
+}
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(value) for value in text.split(',') if value.strip() != '']
+
+
+def parse_commandline() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--branches', type=_int_list, default=[10, 1000], help='Comma separated branch counts')
+    parser.add_argument('--remotes', type=_int_list, default=[1, 3], help='Comma separated remote counts')
+    parser.add_argument('--checkouts', type=_int_list, default=[100], help='Comma separated checkout counts for scan')
+    parser.add_argument('--repeat', type=int, default=3, help='The number of times each command is timed')
+    parser.add_argument('-o', '--output', default='bench_results.json', help='The path of the JSON results')
+    parser.add_argument('--compare', help='A previous JSON results file to compare against')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated repositories')
+    return parser.parse_args()
+
+
+def git(*args: str, cwd: Optional[str] = None, stdin: Optional[str] = None) -> str:
+    env = dict(os.environ, **GIT_IDENTITY)
+    process = subprocess.run(['git'] + list(args), cwd=cwd, env=env, check=True, stdout=subprocess.PIPE,
+                             input=stdin.encode() if stdin is not None else None)
+    return process.stdout.decode().strip()
+
+
+def make_remote(path: str, branches: int) -> str:
+    git('init', '-q', '--bare', path)
+
+    tree = git('mktree', cwd=path, stdin='')
+    commit = git('commit-tree', tree, '-m', 'initial commit', cwd=path)
+
+    # the branches are created in a single transaction and packed, like a long lived server repo would be
+    refs = ['master'] + [f'feature/branch-{index}' for index in range(branches)]
+    git('update-ref', '--stdin', cwd=path, stdin=''.join(f'create refs/heads/{ref} {commit}\n' for ref in refs))
+    git('pack-refs', '--all', cwd=path)
+
+    return commit
+
+
+def make_clone(path: str, remotes: List[str], branches: int):
+    git('init', '-q', path)
+    for index, remote in enumerate(remotes):
+        git('remote', 'add', 'origin' if index == 0 else f'remote{index}', remote, cwd=path)
+    git('fetch', '-q', '--all', cwd=path)
+
+    # track every remote feature branch locally, so that the branches removed later on become stale
+    commit = git('rev-parse', 'refs/remotes/origin/master', cwd=path)
+    names = [f'feature/branch-{index}' for index in range(branches)]
+    git('update-ref', '--stdin', cwd=path, stdin=''.join(f'create refs/heads/{name} {commit}\n' for name in names))
+    git('checkout', '-q', '-B', 'master', 'refs/remotes/origin/master', cwd=path)
+
+    with open(os.path.join(path, '.git', 'config'), 'a') as config_file:
+        for name in names:
+            config_file.write(f'[branch "{name}"]\n\tremote = origin\n\tmerge = refs/heads/{name}\n')
+
+
+def prune_remote(path: str, clone: str, fraction: float):
+    # remove a fraction of the branches from the remote, then fetch so they are "gone" in the clone
+    refs = git('for-each-ref', '--format=%(refname)', 'refs/heads/feature', cwd=path).splitlines()
+    gone = refs[:int(len(refs) * fraction)]
+    git('update-ref', '--stdin', cwd=path, stdin=''.join(f'delete {ref}\n' for ref in gone))
+    git('fetch', '-q', '--prune', 'origin', cwd=clone)
+
+
+def make_workspace(path: str, checkouts: int):
+    # a tree of checkouts a few levels deep, mixed with folders that the scan has to walk through
+    template = os.path.join(path, '.template')
+    git('init', '-q', template)
+
+    for index in range(checkouts):
+        group = os.path.join(path, f'group-{index % 10}', f'team-{index % 7}')
+        checkout = os.path.join(group, f'repo-{index}')
+        os.makedirs(os.path.join(checkout, 'src', 'module'), exist_ok=True)
+        shutil.copytree(os.path.join(template, '.git'), os.path.join(checkout, '.git'))
+
+    shutil.rmtree(template)
+
+
+class Runner:
+    def __init__(self, scratch: str, repeat: int):
+        self._repeat = repeat
+        self._shim_dir = os.path.join(scratch, 'shim')
+        self._log_path = os.path.join(scratch, 'git-calls.log')
+
+        os.makedirs(self._shim_dir)
+        shim_path = os.path.join(self._shim_dir, 'git')
+        with open(shim_path, 'w') as shim_file:
+            shim_file.write(GIT_SHIM.format(git=shutil.which('git')))
+        os.chmod(shim_path, 0o755)
+
+        self.results: List[Dict] = []
+
+    def _env(self) -> Dict[str, str]:
+        python_path = os.pathsep.join(filter(None, [SOURCE_ROOT, os.environ.get('PYTHONPATH')]))
+        return dict(
+            os.environ,
+            PATH=os.pathsep.join([self._shim_dir, os.environ.get('PATH', '')]),
+            PYTHONPATH=python_path,
+            ACCOUTREMENTS_BENCH_GIT_LOG=self._log_path,
+            XDG_CACHE_HOME=os.path.join(os.path.dirname(self._shim_dir), 'cache'),
+            GIT_TERMINAL_PROMPT='0',
+            ACCOUTREMENTS_FETCH_TTL='0',  # always measure the fetch so the runs are comparable
+            ACCOUTREMENTS_DAEMON='0',  # a daemon running on the machine would answer the state queries instead
+            **GIT_IDENTITY,
+        )
+
+    def run(self, scenario: str, params: Dict[str, int], args: List[str], cwd: str, setup=None,
+            repeat: Optional[int] = None):
+        timings = []
+        git_calls = 0
+        returncode = 0
+        for _ in range(repeat or self._repeat):
+            if setup is not None:
+                setup()
+
+            if os.path.exists(self._log_path):
+                os.unlink(self._log_path)
+
+            cmd = [sys.executable, '-m', 'accoutrements'] + args
+            started = time.perf_counter()
+            process = subprocess.run(cmd, cwd=cwd, env=self._env(), stdin=subprocess.DEVNULL,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            timings.append(time.perf_counter() - started)
+
+            returncode = process.returncode
+            if returncode != 0:
+                print(process.stderr.decode(), file=sys.stderr)
+
+            with open(self._log_path, 'a+') as log_file:
+                log_file.seek(0)
+                git_calls = len(log_file.read().splitlines())
+
+        result = {
+            'scenario': scenario,
+            'command': ' '.join(args),
+            'params': params,
+            'seconds': min(timings),
+            'mean_seconds': sum(timings) / len(timings),
+            'git_calls': git_calls,
+            'returncode': returncode,
+        }
+        self.results.append(result)
+
+        label = ', '.join(f'{key}={value}' for key, value in params.items())
+        print(f'{scenario:<12} {label:<28} {result["seconds"]:8.3f}s {git_calls:6d} git calls')
+
+
+def run_repository_benchmarks(runner: Runner, scratch: str, branches: int, remotes: int):
+    params = {'branches': branches, 'remotes': remotes}
+    base = os.path.join(scratch, f'repo-{branches}-{remotes}')
+
+    remote_paths = [os.path.join(base, f'remote-{index}.git') for index in range(remotes)]
+    for remote_path in remote_paths:
+        make_remote(remote_path, branches)
+
+    clone = os.path.join(base, 'clone')
+    make_clone(clone, remote_paths, branches)
+
+    runner.run('master', params, ['master', '--fetch'], cwd=clone)
+
+    def reset_feature_branch():
+        git('checkout', '-q', 'master', cwd=clone)
+        git('update-ref', '-d', 'refs/heads/feature/bench', cwd=clone)
+
+    runner.run('feature', params, ['feature', 'bench'], cwd=clone, setup=reset_feature_branch)
+
+    # half of the local branches become stale
+    prune_remote(remote_paths[0], clone, 0.5)
+    runner.run('tidy-dry-run', params, ['tidy', '--dry-run'], cwd=clone)
+
+    # git del removes a few branches from every remote at once, the repeated runs measure the already deleted case
+    remote_names = ['origin'] + [f'remote{index}' for index in range(1, remotes)]
+    targets = [f'feature/branch-{index}' for index in range(branches // 2, min(branches, branches // 2 + 10))]
+    del_args = ['del', '--yes'] + [f'{remote}/{target}' for remote in remote_names for target in targets]
+    runner.run('del', params, del_args, cwd=clone)
+
+    # tidy is only timed once since it removes the stale branches
+    runner.run('tidy', params, ['tidy', '--yes'], cwd=clone, repeat=1)
+
+
+def run_scan_benchmarks(runner: Runner, scratch: str, checkouts: int):
+    workspace = os.path.join(scratch, f'workspace-{checkouts}')
+    make_workspace(workspace, checkouts)
+
+    runner.run('scan-cold', {'checkouts': checkouts}, ['ditto', 'scan', '--rebuild'], cwd=workspace)
+    runner.run('scan-warm', {'checkouts': checkouts}, ['ditto', 'scan'], cwd=workspace)
+
+    # the serial and threaded walks, which decide the default number of scan jobs for this machine
+    for jobs in (1, 8):
+        runner.run(f'scan-jobs-{jobs}', {'checkouts': checkouts}, ['ditto', 'scan', '--rebuild', '--jobs', str(jobs)],
+                   cwd=workspace)
+
+
+def print_comparison(results: List[Dict], previous_path: str):
+    with open(previous_path, 'r') as previous_file:
+        previous = json.load(previous_file)
+
+    def key(result):
+        return result['scenario'], json.dumps(result['params'], sort_keys=True)
+
+    baseline = {key(result): result for result in previous.get('results', [])}
+
+    print()
+    print(f'Comparison against {previous_path}')
+    for result in results:
+        before = baseline.get(key(result))
+        if before is None:
+            continue
+
+        change = (result['seconds'] - before['seconds']) / before['seconds'] * 100 if before['seconds'] > 0 else 0.0
+        label = ', '.join(f'{k}={v}' for k, v in result['params'].items())
+        print(f'{result["scenario"]:<12} {label:<28} {before["seconds"]:8.3f}s -> {result["seconds"]:8.3f}s '
+              f'({change:+6.1f}%)  git calls {before["git_calls"]} -> {result["git_calls"]}')
+
+
+def main():
+    args = parse_commandline()
+
+    scratch = tempfile.mkdtemp(prefix='accoutrements-bench-')
+    try:
+        runner = Runner(scratch, args.repeat)
+
+        for branches in args.branches:
+            for remotes in args.remotes:
+                run_repository_benchmarks(runner, scratch, branches, remotes)
+
+        for checkouts in args.checkouts:
+            run_scan_benchmarks(runner, scratch, checkouts)
+
+    finally:
+        if args.keep:
+            print(f'Repositories kept in {scratch}')
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    with open(args.output, 'w') as output_file:
+        json.dump({
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'git': git('--version'),
+            'platform': platform.platform(),
+            'results': runner.results,
+        }, output_file, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.compare is not None:
+        print_comparison(runner.results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
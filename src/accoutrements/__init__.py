@@ -1,78 +1,77 @@
-import re
-import subprocess
 import sys
 from typing import Set, Optional
 
-STALE_REGEX = re.compile(r'(?:\*?\s+)?([\w/\-.]+)\s+[0-9a-f]+ (?:\[[\w/\-.]+(: gone)?])?.*')
+from .refs import load_ref_snapshot, invalidate_ref_snapshot, iter_stale_branches, query_remote_head, remote_head
 
+MASTER_NAMES = ('master', 'main', 'trunk')
+DEVELOP_NAMES = ('develop',)
 
-def detect_upstream_remote():
-    remotes = subprocess.check_output(['git', 'remote']).decode()
-    remotes = set([r.strip() for r in remotes.splitlines()])
+
+def find_upstream_remote(cwd: Optional[str] = None) -> Optional[str]:
+    remotes = load_ref_snapshot(cwd).remotes
 
     if 'upstream' in remotes:
         return 'upstream'
     elif 'origin' in remotes:
         return 'origin'
 
-    print('Unable to determine the correct upstream remote')
-    sys.exit(1)
+    return None
 
 
-def detect_stale_branches():
-    # get the list of local branches with extra verboseness
-    cmd = ['git', 'branch', '-vv']
-    output = subprocess.check_output(cmd).decode().strip()
+def detect_upstream_remote():
+    from .metadata import load_metadata
 
-    stale_branches = set()
-    for line in output.splitlines():
-        line = line.strip()
-        match = STALE_REGEX.match(line)
+    remote = load_metadata().remote
+    if remote is not None:
+        return remote
 
-        if match is None:
-            print('Match failure: "{}"'.format(line))
-            continue  # doesn't match what we are looking for
+    print('Unable to determine the correct upstream remote')
+    sys.exit(1)
 
-        if match.group(2) is not None:
-            stale_branches.add(match.group(1))
 
-    return stale_branches
+def detect_stale_branches(cwd: Optional[str] = None) -> Set[str]:
+    return set(iter_stale_branches(cwd))
 
 
-def build_remote_branch_set(remote: str) -> Set[str]:
-    matcher = re.compile(r'^\s+(\w+)/(\w+)')
+def build_remote_branch_set(remote: str, cwd: Optional[str] = None) -> Set[str]:
+    return load_ref_snapshot(cwd).remote_branches(remote)
 
-    remote_branches = set()
 
-    # attempt to detect
-    cmd = ['git', 'branch', '--list', '-r']
-    for line in subprocess.check_output(cmd).decode().splitlines():
-        match = matcher.search(line)
-        assert match is not None
+def find_master_branch(remote: str, cwd: Optional[str] = None) -> Optional[str]:
+    remote_branches = build_remote_branch_set(remote, cwd=cwd)
 
-        # split the remote name
-        branch_remote, branch_name = match.groups()
-        if branch_remote == remote:
-            remote_branches.add(branch_name)
+    for master_name in MASTER_NAMES:
+        if master_name in remote_branches:
+            return master_name
 
-    return remote_branches
+    # otherwise use the default branch of the remote, only asking the server when it has not been recorded locally
+    return remote_head(remote, cwd=cwd) or query_remote_head(remote, cwd=cwd)
 
 
-def detect_master_branch(remote: str) -> str:
-    remote_branches = build_remote_branch_set(remote)
+def detect_master_branch(remote: str, cwd: Optional[str] = None) -> str:
+    from .metadata import load_metadata
 
-    for master_name in ('master', 'main', 'trunk'):
-        if master_name in remote_branches:
-            return master_name
+    metadata = load_metadata(cwd)
+    master_name = metadata.master if metadata.remote == remote else find_master_branch(remote, cwd=cwd)
+    if master_name is not None:
+        return master_name
 
+    remote_branches = build_remote_branch_set(remote, cwd=cwd)
     raise RuntimeError(f'Unable to detect master branch name: {",".join(list(sorted(remote_branches)))}')
 
 
-def detect_develop_branch(remote: str) -> Optional[str]:
-    remote_branches = build_remote_branch_set(remote)
+def find_develop_branch(remote: str, cwd: Optional[str] = None) -> Optional[str]:
+    remote_branches = build_remote_branch_set(remote, cwd=cwd)
 
-    for develop_name in ('develop',):
+    for develop_name in DEVELOP_NAMES:
         if develop_name in remote_branches:
             return develop_name
 
     return None
+
+
+def detect_develop_branch(remote: str, cwd: Optional[str] = None) -> Optional[str]:
+    from .metadata import load_metadata
+
+    metadata = load_metadata(cwd)
+    return metadata.develop if metadata.remote == remote else find_develop_branch(remote, cwd=cwd)
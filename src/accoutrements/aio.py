@@ -0,0 +1,61 @@
+from typing import Any, Callable, List, NamedTuple, Optional, Union
+
+from . import runner
+
+# asyncio is only imported once a command actually runs something concurrently, since it is expensive to import
+
+
+class ProcessResult(NamedTuple):
+    returncode: int
+    stdout: bytes
+    stderr: bytes
+
+
+async def run(cmd: List[str], cwd: Optional[str] = None, check: bool = False, input: Optional[bytes] = None,
+              stdin=None, stderr=runner.PIPE, env: Optional[dict] = None) -> ProcessResult:
+    """Run the command without blocking the event loop, with the same tracing as the synchronous runner"""
+    import asyncio
+
+    with runner.traced(cmd, cwd) as record:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, cwd=cwd, env=env, stdout=runner.PIPE, stderr=stderr,
+            stdin=runner.PIPE if input is not None else stdin)
+        try:
+            stdout, stderr_output = await process.communicate(input)
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+
+        runner.record_result(record, process.returncode, stdout, stderr_output)
+
+    if check and process.returncode != 0:
+        raise runner.CalledProcessError(process.returncode, cmd, stdout, stderr_output)
+
+    return ProcessResult(process.returncode, stdout, stderr_output or b'')
+
+
+async def git(*args: str, cwd: Optional[str] = None, check: bool = True, **kwargs) -> ProcessResult:
+    return await run(['git'] + list(args), cwd=cwd, check=check, **kwargs)
+
+
+def gather(*tasks: Union[Callable[[], Any], Any], jobs: Optional[int] = None) -> List[Any]:
+    """
+    Run the independent tasks concurrently, with at most `jobs` of them in flight at once, returning their results in
+    order. Each task is either a coroutine (i.e. `git(...)`) or a plain function, which is run on a worker thread
+    """
+    import asyncio
+
+    async def run_all():
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(max(jobs or len(tasks), 1))
+
+        async def run_task(task):
+            async with semaphore:
+                if asyncio.iscoroutine(task):
+                    return await task
+                return await loop.run_in_executor(None, task)
+
+        return await asyncio.gather(*(run_task(task) for task in tasks))
+
+    return list(asyncio.run(run_all()))
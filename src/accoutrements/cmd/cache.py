@@ -0,0 +1,52 @@
+import argparse
+import os
+
+from ..colours import green, yellow
+from ..metadata import SECTIONS, load_metadata
+from ..state import STATE_FOLDER
+from ..config import git_common_dir
+
+
+def parse_commandline() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('action', choices=('show', 'clear'), help='Show or remove the cached state of the repository')
+    return parser.parse_args()
+
+
+def _show(folder: str):
+    print(f'Cache folder: {folder}')
+
+    metadata = load_metadata()
+    for section in SECTIONS:
+        values = metadata.values(section)
+        if values is None:
+            print(f'- {section}: not cached')
+            continue
+
+        freshness = green('fresh') if metadata.is_fresh(section) else yellow('stale')
+        summary = ', '.join(f'{name}={value}' for name, value in sorted(values.items()))
+        print(f'- {section}: {summary} ({freshness})')
+
+    if os.path.isdir(folder):
+        for name in sorted(os.listdir(folder)):
+            print(f'{name}: {os.path.getsize(os.path.join(folder, name))} bytes')
+
+
+def _clear(folder: str):
+    removed = 0
+    if os.path.isdir(folder):
+        for name in sorted(os.listdir(folder)):
+            os.unlink(os.path.join(folder, name))
+            removed += 1
+
+    print(f'Removed {removed} cache files from {folder}')
+
+
+def main():
+    args = parse_commandline()
+    folder = os.path.join(git_common_dir(), STATE_FOLDER)
+
+    if args.action == 'show':
+        _show(folder)
+    else:
+        _clear(folder)
@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+
+from ..colours import green, red
+from ..daemon import query_daemon, serve, socket_path
+
+
+def parse_commandline() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--socket', help='The path of the unix socket (default: $ACCOUTREMENTS_DAEMON_SOCKET)')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action='store_true', help='Report whether the daemon is running')
+    group.add_argument('--stop', action='store_true', help='Stop the running daemon')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_commandline()
+    path = args.socket or socket_path()
+
+    status = query_daemon({'command': 'status'}, path=path)
+
+    if args.status:
+        if status is None:
+            print(red(f'The daemon is not running ({path})'))
+            sys.exit(1)
+        print(green(f'The daemon is running (pid {status["pid"]}, {path})'))
+        print(f'{status["repositories"]} repositories cached, {status["hits"]} hits, {status["misses"]} misses')
+        return
+
+    if args.stop:
+        if status is None:
+            print(f'The daemon is not running ({path})')
+            return
+        query_daemon({'command': 'stop'}, path=path)
+        print(f'Stopped the daemon (pid {status["pid"]})')
+        return
+
+    if status is not None:
+        print(red(f'The daemon is already running (pid {status["pid"]}, {path})'))
+        sys.exit(1)
+
+    # the socket of a daemon that did not shut down cleanly is left behind
+    if os.path.exists(path):
+        os.unlink(path)
+
+    print(f'Listening on {path}')
+    try:
+        serve(path)
+    except KeyboardInterrupt:
+        pass
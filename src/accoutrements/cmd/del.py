@@ -1,19 +1,22 @@
 import argparse
-import subprocess
-from typing import Optional, Tuple, Set
+import sys
+from typing import Optional, Tuple, Set, List, Dict
 
-from ..colours import yellow
+from .. import runner
+from ..colours import yellow, red
+from ..refs import delete_local_branches
 
 
 def parse_commandline() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument('branches', nargs='+', help='The branch references that need to be removed')
     parser.add_argument('--dry-run', action='store_true', help='Do not actually delete the branches')
+    parser.add_argument('-y', '--yes', action='store_true', help='Do not prompt for confirmation')
     return parser.parse_args()
 
 
 def get_remotes() -> Set[str]:
-    return set(subprocess.check_output(['git', 'remote']).decode().splitlines())
+    return set(runner.check_output(['git', 'remote']).decode().splitlines())
 
 
 def extract(remotes: Set[str], ref: str) -> Tuple[Optional[str], str]:
@@ -31,7 +34,61 @@ def extract(remotes: Set[str], ref: str) -> Tuple[Optional[str], str]:
     return remote, branch
 
 
+class RemoteDeletion:
+    def __init__(self, remote: str, branches: List[str]):
+        self.remote = remote
+        self.branches = branches
+        self.existing: Set[str] = set()
+        self.deleted: List[str] = []
+        self.failed: Dict[str, str] = {}
+        self.error: Optional[str] = None
+
+    @property
+    def skipped(self) -> List[str]:
+        return [branch for branch in self.branches if branch not in self.existing]
+
+
+def detect_remote_branches(deletion: RemoteDeletion):
+    # a single ls-remote call is used to determine which of the branches still exist on the remote
+    cmd = ['git', 'ls-remote', '--heads', deletion.remote] + [f'refs/heads/{branch}' for branch in deletion.branches]
+    process = runner.run(cmd, stdout=runner.PIPE, stderr=runner.PIPE)
+    if process.returncode != 0:
+        deletion.error = process.stderr.decode().strip()
+        return
+
+    refs = {line.split('\t', 1)[1] for line in process.stdout.decode().splitlines() if '\t' in line}
+    deletion.existing = {branch for branch in deletion.branches if f'refs/heads/{branch}' in refs}
+
+
+def push_remote_deletions(deletion: RemoteDeletion):
+    branches = [branch for branch in deletion.branches if branch in deletion.existing]
+    if deletion.error is not None or len(branches) == 0:
+        return
+
+    cmd = ['git', 'push', '--porcelain', '--delete', deletion.remote] + branches
+    process = runner.run(cmd, stdout=runner.PIPE, stderr=runner.PIPE)
+
+    # the porcelain output reports the status of each ref: <flag> \t <from>:<to> \t <summary>
+    for line in process.stdout.decode().splitlines():
+        tokens = line.split('\t')
+        if len(tokens) < 3 or not tokens[1].startswith(':refs/heads/'):
+            continue
+
+        branch = tokens[1][len(':refs/heads/'):]
+        if tokens[0] == '-':
+            deletion.deleted.append(branch)
+        else:
+            deletion.failed[branch] = tokens[2]
+
+    # anything not reported was not processed, i.e. the push failed completely
+    for branch in branches:
+        if branch not in deletion.deleted and branch not in deletion.failed:
+            deletion.failed[branch] = process.stderr.decode().strip() or 'push failed'
+
+
 def main():
+    from concurrent.futures import ThreadPoolExecutor
+
     args = parse_commandline()
     remotes = get_remotes()
 
@@ -45,34 +102,65 @@ def main():
         branches.add(branch)
         playlist[remote] = branches
 
-    # step 2. display the list for the user
-    local_branches = playlist.get(None, [])
+    # step 2. check which of the branches still exist on each of the remotes
+    remotes = list(sorted(filter(lambda x: x is not None, playlist.keys())))
+    deletions = [RemoteDeletion(remote, list(sorted(playlist[remote]))) for remote in remotes]
+    with ThreadPoolExecutor(max_workers=max(len(deletions), 1)) as pool:
+        list(pool.map(detect_remote_branches, deletions))
+
+    # step 3. display the list for the user
+    local_branches = list(sorted(playlist.get(None, [])))
     if len(local_branches) > 0:
         print('The following {} branches will be deleted:'.format(yellow('local')))
         for branch in local_branches:
             print('- {}'.format(branch))
     print()
 
-    remotes = list(sorted(filter(lambda x: x is not None, playlist.keys())))
-    for remote in remotes:
-        remote_branches = list(sorted(playlist[remote]))
-        if len(remote_branches) > 0:
-            print('The following branches will be deleted from {}:'.format(yellow(remote)))
-            for branch in remote_branches:
-                print('- {}'.format(branch))
+    for deletion in deletions:
+        if deletion.error is not None:
+            print(red('Unable to query {}: {}'.format(deletion.remote, deletion.error)))
+        elif len(deletion.branches) > 0:
+            print('The following branches will be deleted from {}:'.format(yellow(deletion.remote)))
+            for branch in deletion.branches:
+                suffix = '' if branch in deletion.existing else ' (already deleted)'
+                print('- {}{}'.format(branch, suffix))
         print()
 
     # we are dry running then stop here
     if args.dry_run:
         return
 
-    input('Press enter to continue')
+    if not args.yes:
+        input('Press enter to continue')
 
     # delete all the local branches
-    for branch in local_branches:
-        subprocess.check_call(['git', 'branch', '-D', branch])
-
-    # delete all the remote branches
-    for remote in remotes:
-        remote_branches = list(sorted(playlist[remote]))
-        subprocess.check_call(['git', 'push', '--delete', remote] + remote_branches)
+    local_results = delete_local_branches(local_branches)
+
+    # delete all the remote branches, each remote is pushed to concurrently
+    with ThreadPoolExecutor(max_workers=max(len(deletions), 1)) as pool:
+        list(pool.map(push_remote_deletions, deletions))
+
+    # step 4. summarise the results
+    failures = 0
+    if len(local_results) > 0:
+        deleted = [branch for branch, error in local_results.items() if error is None]
+        print('{}: {} deleted, {} failed'.format(yellow('local'), len(deleted), len(local_results) - len(deleted)))
+        for branch, error in sorted(local_results.items()):
+            if error is not None:
+                failures += 1
+                print(red('- {}: {}'.format(branch, error)))
+
+    for deletion in deletions:
+        if deletion.error is not None:
+            failures += 1
+            print('{}: {}'.format(yellow(deletion.remote), red(deletion.error)))
+            continue
+
+        print('{}: {} deleted, {} skipped, {} failed'.format(
+            yellow(deletion.remote), len(deletion.deleted), len(deletion.skipped), len(deletion.failed)))
+        for branch, reason in sorted(deletion.failed.items()):
+            failures += 1
+            print(red('- {}: {}'.format(branch, reason)))
+
+    if failures > 0:
+        sys.exit(1)
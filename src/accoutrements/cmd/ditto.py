@@ -1,14 +1,23 @@
 import argparse
+import functools
 import os
 import re
-import subprocess
 import sys
+from collections import Counter
 from dataclasses import dataclass
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, Dict, List
 
-import toml
+from .. import aio, runner
+from ..colours import green, red
+from ..config import GitConfigFile, update_repo_config, UNCHANGED, UPDATED, FAILED
+from ..discovery import DEFAULT_SCAN_JOBS, ScanRules, ScanStats
+from ..scan_index import scan_repositories
 
 TARGET_FILENAME = '.git-ditto.toml'
+
+# cloning is bound by the network rather than the CPU, so sync does not use the scan default
+DEFAULT_CLONE_JOBS = 8
+
 HEADER = r"""
 ________  .__  __    __          
 \______ \ |__|/  |__/  |_  ____  
@@ -19,10 +28,6 @@ ________  .__  __    __
 
 """
 
-SCAN_DIR_EXCEPTIONS = {
-    'node_modules',
-}
-
 
 @dataclass
 class DittoConfig:
@@ -38,39 +43,117 @@ class DittoConfig:
             self.signing_key is not None,
         ])
 
+    @property
+    def config_values(self) -> Dict[str, str]:
+        values = {
+            'user.name': self.name,
+            'user.email': self.email,
+            'user.signingkey': self.signing_key,
+        }
+        return {key: value for key, value in values.items() if value is not None}
+
+    def merge(self, parent: 'DittoConfig') -> 'DittoConfig':
+        return DittoConfig(
+            name=self.name if self.name is not None else parent.name,
+            email=self.email if self.email is not None else parent.email,
+            signing_key=self.signing_key if self.signing_key is not None else parent.signing_key,
+        )
 
-def find_ditto_config() -> Optional[str]:
-    current_folder = os.path.abspath(os.getcwd())
 
-    while True:
-        ditto_path = os.path.join(current_folder, TARGET_FILENAME)
-        if os.path.exists(ditto_path):
-            return ditto_path
+@functools.lru_cache(maxsize=None)
+def _load_toml(path: str) -> dict:
+    import toml
 
-        next_folder = os.path.dirname(current_folder)
-        if next_folder == '/':
-            break
+    with open(path, 'r') as cfg_file:
+        return toml.load(cfg_file)
 
-        current_folder = next_folder
 
+class DittoConfigResolver:
+    """Resolves the nearest ditto configuration for a folder, memoizing both the folder lookups and the parsed files"""
 
-def load_ditto_config() -> DittoConfig:
-    ditto_cfg_path = find_ditto_config()
-    cfg = DittoConfig()
-    if ditto_cfg_path is not None:
-        with open(ditto_cfg_path, 'r') as cfg_file:
-            ditto_cfg = toml.load(cfg_file)
+    def __init__(self):
+        self._nearest: Dict[str, Optional[str]] = {}
+        self._configs: Dict[str, DittoConfig] = {}
+
+    def find(self, folder: str) -> Optional[str]:
+        current_folder = os.path.abspath(folder)
+
+        visited = []
+        ditto_path = None
+        while True:
+            if current_folder in self._nearest:
+                ditto_path = self._nearest[current_folder]
+                break
+
+            visited.append(current_folder)
+
+            candidate = os.path.join(current_folder, TARGET_FILENAME)
+            if os.path.exists(candidate):
+                ditto_path = candidate
+                break
+
+            next_folder = os.path.dirname(current_folder)
+            if next_folder == '/' or next_folder == current_folder:
+                break
+
+            current_folder = next_folder
+
+        # every folder visited on the way up shares the same nearest configuration
+        for visited_folder in visited:
+            self._nearest[visited_folder] = ditto_path
+
+        return ditto_path
+
+    def _load(self, ditto_cfg_path: str) -> DittoConfig:
+        cfg = self._configs.get(ditto_cfg_path)
+        if cfg is not None:
+            return cfg
+
+        ditto_cfg = _load_toml(ditto_cfg_path)
 
         user_data = ditto_cfg.get('user', {})
-        cfg.name = user_data.get('name')
-        cfg.email = user_data.get('email')
-        cfg.signing_key = user_data.get('signingkey')
+        cfg = DittoConfig(
+            name=user_data.get('name'),
+            email=user_data.get('email'),
+            signing_key=user_data.get('signingkey'),
+        )
+
+        # optionally fill in any missing values from the configuration of the parent folders
+        cfg_folder = os.path.dirname(ditto_cfg_path)
+        parent_folder = os.path.dirname(cfg_folder)
+        if ditto_cfg.get('inherit', False) and parent_folder != cfg_folder:
+            cfg = cfg.merge(self.resolve(parent_folder))
+
+        self._configs[ditto_cfg_path] = cfg
+        return cfg
+
+    def scan_rules(self, folder: str) -> ScanRules:
+        """The `[scan]` settings from the nearest configuration"""
+        ditto_cfg_path = self.find(folder)
+        scan_cfg = _load_toml(ditto_cfg_path).get('scan', {}) if ditto_cfg_path is not None else {}
+        return ScanRules(
+            prune=tuple(scan_cfg.get('prune', ())),
+            max_depth=scan_cfg.get('max_depth'),
+            one_file_system=scan_cfg.get('one_file_system', False),
+        )
 
-    return cfg
+    def resolve(self, folder: str) -> DittoConfig:
+        ditto_cfg_path = self.find(folder)
+        if ditto_cfg_path is None:
+            return DittoConfig()
+        return self._load(ditto_cfg_path)
+
+
+def find_ditto_config() -> Optional[str]:
+    return DittoConfigResolver().find(os.getcwd())
+
+
+def load_ditto_config() -> DittoConfig:
+    return DittoConfigResolver().resolve(os.getcwd())
 
 
 def clone_url(text) -> Tuple[str, str]:
-    if text in ('scan', 'update'):
+    if text in ('scan', 'update', 'sync'):
         return text, '.'
 
     match = re.match(r'.*?/(.*)\.git$', text)
@@ -85,110 +168,188 @@ def parse_commandline() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument('url', type=clone_url, help='The URL to make the clone')
     parser.add_argument('--deep', action='store_true', help='Scan deeply')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help=f'The number of folders to scan (default {DEFAULT_SCAN_JOBS}) or repositories to clone '
+                             f'(default {DEFAULT_CLONE_JOBS}) concurrently')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the cached scan index and rescan every folder')
+    parser.add_argument('--reference', help='A shared object cache for the clones made by sync')
+    parser.add_argument('--dissociate', action='store_true', default=None,
+                        help='Copy the objects out of the reference cache once each clone is complete')
+    parser.add_argument('--max-depth', type=int, help='The maximum number of folders to descend below the scan folder')
+    parser.add_argument('-x', '--one-file-system', action='store_true', default=None,
+                        help='Do not descend into folders on other file systems')
     return parser.parse_args()
 
 
-def _filter_folder(root: str, path: Optional[str]):
-    if path is None:
-        return False
+def _run_scan(args: argparse.Namespace, path: str, rules: ScanRules, stats: ScanStats):
+    jobs = DEFAULT_SCAN_JOBS if args.jobs is None else args.jobs
+    return scan_repositories(path, deep=args.deep, jobs=jobs, rebuild=args.rebuild, rules=rules, stats=stats)
+
 
-    full_path = os.path.join(root, path)
+def run_scan(args: argparse.Namespace, resolver: DittoConfigResolver, search_folder: str):
+    print('Run scan')
 
-    if not os.path.isdir(full_path):
-        return False
+    # the command line options take priority over the rules in the configuration
+    rules = resolver.scan_rules(search_folder)
+    if args.max_depth is not None:
+        rules = rules._replace(max_depth=args.max_depth)
+    if args.one_file_system is not None:
+        rules = rules._replace(one_file_system=args.one_file_system)
 
-    if path in SCAN_DIR_EXCEPTIONS:
-        return False
+    # each repository is updated with its nearest configuration
+    summary = Counter()
+    stats = ScanStats()
+    for git_repo_path in _run_scan(args, search_folder, rules, stats):
+        summary[run_update(resolver.resolve(git_repo_path), git_repo_path)] += 1
 
-    if path.startswith('.'):
-        return False
+    print()
+    print(', '.join(f'{summary[status]} {status}' for status in (UNCHANGED, UPDATED, FAILED)))
+    print(stats)
 
-    return True
 
+CONFIG_LABELS = {
+    'user.name': 'user name',
+    'user.email': 'user email',
+    'user.signingkey': 'user signing key',
+}
 
-def _list_folder(path) -> List[Optional[str]]:
-    try:
-        return os.listdir(path)
-    except PermissionError:
-        print(f'Unable to read folder {path}')
-        return [None]
 
+def run_update(cfg: DittoConfig, destination_folder: str) -> str:
+    if not cfg.updates_present:
+        return UNCHANGED
 
-def _run_scan(args: argparse.Namespace, path: str):
-    scan_list = [path]
-    while len(scan_list) > 0:
-        current = scan_list.pop(0)
+    # apply the configuration to the clone, only the values that differ are written
+    result = update_repo_config(destination_folder, cfg.config_values)
 
-        git_path = os.path.join(current, '.git')
+    if result.status == UPDATED:
+        print()
+        print(f"Configuration updates ({destination_folder})")
+        print()
+        for key, value in result.changes.items():
+            print(f'Set {CONFIG_LABELS.get(key, key)} to: {value}')
+    elif result.status == FAILED:
+        print(red(f'Configuration update failed ({destination_folder}): {result.error}'))
+    else:
+        print(f'Configuration unchanged ({destination_folder})')
 
-        # check to see if the current level is a git repo
-        if os.path.isdir(git_path):
-            yield current
+    return result.status
 
-            # check to see if this git repo has git modules
-            has_git_modules = os.path.exists(os.path.join(current, '.gitmodules'))
 
-            # Determine if we should stop processing this branch. In the answer to this should be yes since we have
-            # found a git repo. However, if there are git modules then we should continue the search down. Alternatively
-            # if the user has specified the deep flag we continue searching
-            if has_git_modules or args.deep:
-                skip_current_level = False
-            else:
-                skip_current_level = True
+class ManifestClone:
+    def __init__(self, url: str, path: str):
+        self.url = url
+        self.path = path
+        self.status: Optional[str] = None
+        self.config_status: Optional[str] = None
+        self.error: Optional[str] = None
 
-            # skip the level if we desire
-            if skip_current_level:
-                continue
 
-        # update the scan list
-        scan_list.extend(
-            map(
-                lambda x: os.path.join(current, x),  # add the current prefix
-                filter(
-                    lambda x: _filter_folder(current, x),
-                    _list_folder(current)
-                )
-            )
-        )
+def default_clone_folder(url: str) -> str:
+    name = os.path.basename(url.rstrip('/').replace(':', '/'))
+    return name[:-len('.git')] if name.endswith('.git') else name
 
 
-def run_scan(args: argparse.Namespace, cfg: DittoConfig, search_folder: str):
-    print('Run scan')
+def load_clone_manifest(ditto_cfg_path: str) -> Tuple[List[ManifestClone], dict]:
+    """The repositories listed in the configuration (relative to its folder) and the `[clone]` settings"""
+    ditto_cfg = _load_toml(ditto_cfg_path)
+    base = os.path.dirname(ditto_cfg_path)
 
-    for git_repo_path in _run_scan(args, search_folder):
-        # print(git_repo_path)
-        run_update(cfg, git_repo_path)
+    clones = []
+    for repo in ditto_cfg.get('repos', []):
+        path = os.path.expanduser(repo.get('path', default_clone_folder(repo['url'])))
+        clones.append(ManifestClone(repo['url'], os.path.join(base, path)))
+    return clones, ditto_cfg.get('clone', {})
 
 
-def run_update(cfg: DittoConfig, destination_folder: str):
-    assert os.path.isdir(os.path.join(destination_folder, '.git'))
+def _reference_remote(url: str) -> str:
+    import hashlib
 
-    # print some user headers
-    if cfg.updates_present:
-        print()
-        print(f"Configuration updates ({destination_folder})")
-        print()
+    return 'ditto-' + hashlib.sha1(url.encode()).hexdigest()[:12]
+
+
+def update_reference_cache(cache: str, urls: List[str], jobs: int) -> bool:
+    """Fetch every repository into the shared cache, objects common to forks and siblings are only downloaded once"""
+    if not os.path.isdir(cache):
+        runner.check_call(['git', 'init', '--quiet', '--bare', cache])
+
+    config = GitConfigFile.load(os.path.join(cache, 'config'))
+    remotes = []
+    for url in urls:
+        remote = _reference_remote(url)
+        if config.get(f'remote.{remote}.url') != url:
+            config.set(f'remote.{remote}.url', url)
+            config.set(f'remote.{remote}.fetch', f'+refs/heads/*:refs/remotes/{remote}/*')
+        remotes.append(remote)
+    if config.modified:
+        config.save()
+
+    # tags are left out since forks often have different tags with the same name
+    cmd = ['git', 'fetch', '--quiet', '--no-tags', '--multiple', f'--jobs={max(jobs, 1)}'] + remotes
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    return runner.call(cmd, cwd=cache, env=env, stdin=runner.DEVNULL) == 0
 
-    # apply the configuration to the clone
-    if cfg.name is not None:
-        cmd = ['git', 'config', 'user.name', cfg.name]
-        subprocess.check_call(cmd, cwd=destination_folder)
-        print(f'Set user name to: {cfg.name}')
 
-    if cfg.email is not None:
-        cmd = ['git', 'config', 'user.email', cfg.email]
-        subprocess.check_call(cmd, cwd=destination_folder)
-        print(f'Set user email to: {cfg.email}')
+async def clone_repository(clone: ManifestClone, resolver: DittoConfigResolver, reference: Optional[str] = None,
+                           dissociate: bool = False):
+    if os.path.exists(clone.path):
+        clone.status = 'existing'
+        return
+
+    cmd = ['git', 'clone', '--quiet']
+    if reference is not None:
+        cmd += ['--reference-if-able', reference] + (['--dissociate'] if dissociate else [])
+    cmd += [clone.url, clone.path]
+
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    result = await aio.run(cmd, env=env, stdin=runner.DEVNULL)
+    if result.returncode != 0:
+        errors = result.stderr.decode(errors='replace').strip().splitlines()
+        clone.status = FAILED
+        clone.error = errors[-1] if len(errors) > 0 else f'git clone exited with {result.returncode}'
+        print(red(f'Unable to clone {clone.url}: {clone.error}'))
+        return
+
+    # the configuration is applied as soon as each clone is ready, rather than once they have all finished
+    clone.status = 'cloned'
+    print(f'Cloned {green(clone.url)} into {clone.path}')
+    clone.config_status = run_update(resolver.resolve(clone.path), clone.path)
+
+
+def run_sync(args: argparse.Namespace, resolver: DittoConfigResolver):
+    ditto_cfg_path = resolver.find(os.getcwd())
+    if ditto_cfg_path is None:
+        print(red(f'Unable to find a {TARGET_FILENAME} to sync'))
+        sys.exit(1)
 
-    if cfg.signing_key is not None:
-        cmd = ['git', 'config', 'user.signingkey', cfg.signing_key]
-        subprocess.check_call(cmd, cwd=destination_folder)
-        print(f'Set user signing key to: {cfg.signing_key}')
+    clones, settings = load_clone_manifest(ditto_cfg_path)
+    pending = [clone for clone in clones if not os.path.exists(clone.path)]
+    print(f'Cloning {len(pending)} of the {len(clones)} repositories listed in {ditto_cfg_path}')
+
+    reference = args.reference or settings.get('reference')
+    if reference is not None:
+        reference = os.path.join(os.path.dirname(ditto_cfg_path), os.path.expanduser(reference))
+    dissociate = args.dissociate if args.dissociate is not None else settings.get('dissociate', False)
+
+    jobs = DEFAULT_CLONE_JOBS if args.jobs is None else args.jobs
+    if reference is not None and len(pending) > 0:
+        print(f'Updating the reference cache {reference}')
+        if not update_reference_cache(reference, [clone.url for clone in pending], jobs):
+            print(red('Unable to fully update the reference cache, the clones will download the missing objects'))
+
+    aio.gather(*(clone_repository(clone, resolver, reference, dissociate) for clone in clones), jobs=jobs)
+
+    summary = Counter(clone.status for clone in clones)
+    print()
+    print(f'{summary["cloned"]} cloned, {summary["existing"]} already present, {summary[FAILED]} failed')
+
+    if summary[FAILED] > 0 or any(clone.config_status == FAILED for clone in clones):
+        sys.exit(1)
 
 
 def main():
     args = parse_commandline()
-    cfg = load_ditto_config()
+    resolver = DittoConfigResolver()
+    cfg = resolver.resolve(os.getcwd())
 
     url, destination_folder = args.url
 
@@ -196,7 +357,10 @@ def main():
         run_update(cfg, destination_folder)
         return
     elif url == 'scan':
-        run_scan(args, cfg, destination_folder)
+        run_scan(args, resolver, destination_folder)
+        return
+    elif url == 'sync':
+        run_sync(args, resolver)
         return
 
     # print a nice user header
@@ -204,6 +368,6 @@ def main():
 
     # clone the folder
     cmd = ['git', 'clone', url]
-    subprocess.check_call(cmd)
+    runner.check_call(cmd)
 
     run_update(cfg, destination_folder)
@@ -1,39 +1,88 @@
 #!/usr/bin/env python3
 import argparse
 import os
-import subprocess
+import sys
+import time
 
-from accoutrements import detect_upstream_remote, detect_master_branch, detect_develop_branch
+from accoutrements import aio, detect_upstream_remote, detect_master_branch, detect_develop_branch, runner
+from accoutrements.colours import red
+from accoutrements.config import git_common_dir
+from accoutrements.fetch import fetch_remotes
+from accoutrements.worktrees import add_worktree, sparse_profile
 
 
 def parse_commandline() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument('name', nargs='+', help='The name of the branch')
     parser.add_argument('-p', '--push', action='store_true', help='Push the new branch so that it is setup to track')
-    return parser.parse_args()
+    parser.add_argument('-w', '--worktree', nargs='?', const='', metavar='PATH',
+                        help='Create the branch in a new linked worktree (default: next to the main checkout)')
+    parser.add_argument('--sparse', metavar='PROFILE',
+                        help='Only check out the paths of the sparse-profile.<PROFILE>.path config in the worktree')
+    args = parser.parse_args()
+    if args.sparse is not None and args.worktree is None:
+        parser.error('--sparse can only be used with --worktree')
+    return args
+
+
+def has_working_changes(status: aio.ProcessResult) -> bool:
+    # any staged or unstaged change to a tracked file, untracked files are carried over by the checkout untouched
+    return status.returncode != 0 or status.stdout.strip() != b''
+
+
+def default_worktree_path(branch_name: str) -> str:
+    # i.e. `~/src/project` -> `~/src/project-feature-new-thing`
+    main_checkout = os.path.dirname(git_common_dir())
+    return f'{main_checkout}-{branch_name.replace("/", "-")}'
+
+
+def create_new_worktree(remote: str, branch_name: str, args: argparse.Namespace):
+    fetch_remotes([remote])
+
+    target_branch_name = detect_develop_branch(remote) or detect_master_branch(remote)
+    path = os.path.abspath(args.worktree or default_worktree_path(branch_name))
+
+    sparse_paths = None
+    if args.sparse is not None:
+        sparse_paths = sparse_profile(args.sparse)
+        if len(sparse_paths) == 0:
+            print(red(f'The sparse profile {args.sparse} has no paths (sparse-profile.{args.sparse}.path)'))
+            sys.exit(1)
+
+    # the main checkout is left untouched, so nothing in it needs to be rebuilt or re-indexed
+    started = time.monotonic()
+    add_worktree(path, branch_name, f'{remote}/{target_branch_name}', sparse_paths=sparse_paths)
+    print(f'Created {branch_name} from {remote}/{target_branch_name} in {path} in {time.monotonic() - started:.2f}s')
+
+    if args.push:
+        cmd = ['git', 'push', '-u', 'origin', branch_name]
+        runner.check_call(cmd, cwd=path)
 
 
 def create_new_branch(prefix: str, args: argparse.Namespace):
     remote = detect_upstream_remote()
     print(f'Upstream remote: {remote}')
 
-    # fetch the latest changes from the remote
-    cmd = ['git', 'fetch', remote, '-p']
-    subprocess.check_call(cmd)
-
-    # create the new branch
     base_name = '-'.join(args.name)
     branch_name = f'{prefix}/{base_name}'
-    cmd = ['git', 'checkout', '-b', branch_name]
-    subprocess.check_call(cmd)
 
-    # check to see if there are any working changse
-    cmd = ['git', 'diff', '--exit-code']
-    with open(os.devnull, 'w') as null_file:
-        exit_code = subprocess.call(cmd, stdout=null_file, stderr=subprocess.STDOUT)
-        if exit_code != 0:
-            print('Working changes detected, not resetting branch ref')
-            return
+    if args.worktree is not None:
+        create_new_worktree(remote, branch_name, args)
+        return
+
+    # fetch the latest changes from the remote, while checking to see if there are any working changes. `status` (unlike
+    # `diff`) can use the fsmonitor and refreshes the index, which also speeds up the checkout that follows
+    _, status = aio.gather(
+        lambda: fetch_remotes([remote]), aio.git('status', '--porcelain', '-uno', check=False))
+
+    started = time.monotonic()
+
+    if has_working_changes(status):
+        print('Working changes detected, not resetting branch ref')
+        cmd = ['git', 'checkout', '-b', branch_name]
+        runner.check_call(cmd)
+        print(f'Created {branch_name} in {time.monotonic() - started:.2f}s')
+        return
 
     # detect the master (and optionally develop) branches that is used with this project
     master_branch_name = detect_master_branch(remote)
@@ -42,14 +91,15 @@ def create_new_branch(prefix: str, args: argparse.Namespace):
     # prefer the "develop" target branch name over the "master" branch name
     target_branch_name = develop_branch_name or master_branch_name
 
-    # reset the feature branch on top of the remote upstream
-    cmd = ['git', 'reset', '--hard', f'{remote}/{target_branch_name}']
-    subprocess.check_call(cmd)
+    # create the new branch directly on top of the remote upstream, only the files that differ are touched
+    cmd = ['git', 'checkout', '--no-track', '-b', branch_name, f'{remote}/{target_branch_name}']
+    runner.check_call(cmd)
+    print(f'Created {branch_name} from {remote}/{target_branch_name} in {time.monotonic() - started:.2f}s')
 
     # push if required
     if args.push:
         cmd = ['git', 'push', '-u', 'origin', branch_name]
-        subprocess.check_call(cmd)
+        runner.check_call(cmd)
 
 
 def main():
@@ -0,0 +1,29 @@
+import argparse
+import sys
+
+from .. import runner
+from ..colours import green, red
+from ..fetch import fetch_remotes
+from ..refs import load_ref_snapshot
+
+
+def parse_commandline() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('remotes', nargs='*', help='The remotes to fetch (default: all of them)')
+    parser.add_argument('--force', action='store_true', help='Fetch the remotes even when they are up to date')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_commandline()
+    remotes = args.remotes or load_ref_snapshot().remotes
+
+    # the same freshness checks as the other commands, so recently fetched or unchanged remotes are skipped
+    try:
+        fetched = fetch_remotes(remotes, force=args.force)
+    except runner.CalledProcessError as ex:
+        print(red(f'Unable to fetch {", ".join(remotes)}: {ex}'))
+        sys.exit(1)
+
+    if len(fetched) > 0:
+        print(green(f'Fetched {", ".join(fetched)}'))
@@ -0,0 +1,109 @@
+import argparse
+import os
+import sys
+import time
+from typing import List, NamedTuple
+
+from .. import runner
+from ..colours import green, red, yellow
+from ..discovery import DEFAULT_SCAN_JOBS
+from ..scan_index import scan_repositories
+
+OPERATIONS = ('fetch', 'master', 'tidy')
+DEFAULT_FLEET_JOBS = 8
+
+
+class FleetResult(NamedTuple):
+    path: str
+    returncode: int
+    duration: float
+    output: str
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0
+
+
+def parse_commandline() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('operation', choices=OPERATIONS, help='The operation to run in each of the repositories')
+    parser.add_argument('path', nargs='?', default='.', help='The folder to search for repositories')
+    parser.add_argument('-y', '--yes', action='store_true', help='Do not prompt, apply the changes to every repository')
+    parser.add_argument('-f', '--fetch', action='store_true', help='Fetch the latest updates before master / tidy')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_FLEET_JOBS,
+                        help='The number of repositories to process concurrently')
+    parser.add_argument('--deep', action='store_true', help='Scan deeply')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the cached scan index and rescan every folder')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Print the output from every repository')
+    return parser.parse_args()
+
+
+def build_command(args: argparse.Namespace) -> List[str]:
+    # the commands are run through the shared dispatcher with the same interpreter, fetch included so that it skips
+    # the remotes that are already up to date
+    cmd = [sys.executable, '-m', 'accoutrements', args.operation]
+    if args.fetch and args.operation != 'fetch':
+        cmd.append('--fetch')
+
+    # tidy is interactive, without confirmation up front only report what would be removed
+    if args.operation == 'tidy':
+        cmd.append('--yes' if args.yes else '--dry-run')
+
+    return cmd
+
+
+def run_operation(cmd: List[str], path: str) -> FleetResult:
+    # never allow one of the repositories to block on a prompt
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+
+    started = time.monotonic()
+    try:
+        process = runner.run(cmd, cwd=path, env=env, stdin=runner.DEVNULL, stdout=runner.PIPE,
+                             stderr=runner.STDOUT)
+        returncode, output = process.returncode, process.stdout.decode(errors='replace')
+    except OSError as ex:
+        returncode, output = -1, str(ex)
+
+    return FleetResult(path, returncode, time.monotonic() - started, output)
+
+
+def print_report(results: List[FleetResult], duration: float, verbose: bool = False):
+    for result in sorted(results, key=lambda r: r.path):
+        status = green('ok') if result.success else red('failed')
+        print(f'{result.duration:7.2f}s  {status}  {result.path}')
+
+        if verbose or not result.success:
+            for line in result.output.strip().splitlines():
+                print(f'            {line}')
+
+    failures = sum(1 for result in results if not result.success)
+    serial_duration = sum(result.duration for result in results)
+
+    print()
+    print(f'{len(results)} repositories, {len(results) - failures} ok, {failures} failed')
+    print(f'Total time: {duration:.2f}s (serial time {serial_duration:.2f}s)')
+
+
+def main():
+    from concurrent.futures import ThreadPoolExecutor
+
+    args = parse_commandline()
+    cmd = build_command(args)
+
+    print(f'Running `git {args.operation}` in the repositories under {yellow(args.path)}')
+    print()
+
+    started = time.monotonic()
+
+    # repositories are processed as soon as they have been discovered
+    with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        futures = [
+            pool.submit(run_operation, cmd, path)
+            for path in scan_repositories(args.path, deep=args.deep, jobs=DEFAULT_SCAN_JOBS, rebuild=args.rebuild)
+        ]
+        results = [future.result() for future in futures]
+
+    print_report(results, time.monotonic() - started, verbose=args.verbose)
+
+    if any(not result.success for result in results):
+        sys.exit(1)
@@ -1,30 +1,116 @@
 #!/usr/bin/env python3
 import argparse
-import subprocess
+import os
+import sys
+from typing import List, Set
 
-from accoutrements import detect_upstream_remote, detect_master_branch
+from accoutrements import aio, detect_upstream_remote, detect_master_branch, runner
+from accoutrements.colours import green, red, yellow
+from accoutrements.config import GitConfigError, GitConfigFile, git_common_dir
+from accoutrements.daemon import repository_state
+from accoutrements.fetch import fetch_remotes
+from accoutrements.refs import load_ref_snapshot, move_local_branches
+from accoutrements.worktrees import checked_out_branches
 
 
 def parse_commandline():
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', '--fetch', action='store_true', help='Fetch the lastest updates from the remote')
+    parser.add_argument('--no-checkout', action='store_true',
+                        help='Only fast-forward the local master (and develop) branches, without touching the worktree')
     return parser.parse_args()
 
 
+def _set_upstream(branches: List[str], remote: str):
+    # like `git branch --track` for the branches that did not exist locally
+    try:
+        config = GitConfigFile.load(os.path.join(git_common_dir(), 'config'))
+        for branch in branches:
+            config.set(f'branch.{branch}.remote', remote)
+            config.set(f'branch.{branch}.merge', f'refs/heads/{branch}')
+        config.save()
+    except GitConfigError as ex:
+        print(red(f'Unable to configure the upstream of {", ".join(branches)}: {ex}'))
+
+
+def fast_forward_branches(remote: str, branches: List[str], checked_out: Set[str]) -> bool:
+    """Fast-forward the local branches to their remote counterparts by only updating the refs"""
+    snapshot = load_ref_snapshot()
+
+    moves = []
+    candidates = []
+    ok = True
+    for branch in branches:
+        local = snapshot.resolve(f'refs/heads/{branch}')
+        upstream = snapshot.resolve(f'refs/remotes/{remote}/{branch}')
+        if upstream is None:
+            print(red(f'{branch}: {remote}/{branch} does not exist'))
+            ok = False
+        elif local == upstream:
+            print(f'{branch}: up to date')
+        elif branch in checked_out:
+            print(yellow(f'{branch}: skipped, it is checked out (run without --no-checkout to update it)'))
+        elif local is None:
+            moves.append((branch, None, upstream))
+        else:
+            candidates.append((branch, local, upstream))
+
+    # the ancestry checks are independent of each other
+    results = []
+    if len(candidates) > 0:
+        results = aio.gather(*(
+            aio.git('merge-base', '--is-ancestor', local, upstream, check=False) for _, local, upstream in candidates
+        ))
+    for (branch, local, upstream), result in zip(candidates, results):
+        if result.returncode == 0:
+            moves.append((branch, local, upstream))
+        else:
+            print(red(f'{branch}: not a fast-forward of {remote}/{branch}, refusing to move it'))
+            ok = False
+
+    error = move_local_branches(moves, message=f'master: fast-forward to {remote}')
+    if error is not None:
+        print(red(f'Unable to update {", ".join(branch for branch, _, _ in moves)}: {error}'))
+        return False
+
+    for branch, local, upstream in moves:
+        if local is None:
+            print(green(f'{branch}: created at {upstream[:10]}'))
+        else:
+            print(green(f'{branch}: fast-forwarded {local[:10]}..{upstream[:10]}'))
+
+    created = [branch for branch, local, _ in moves if local is None]
+    if len(created) > 0:
+        _set_upstream(created, remote)
+
+    return ok
+
+
 def main():
     args = parse_commandline()
 
-    remote = detect_upstream_remote()
+    fields = ('remote', 'master', 'develop') if args.no_checkout else ('remote', 'master')
+    state = repository_state(fields=fields)
+    remote = state.remote or detect_upstream_remote()
     print(f'Upstream remote: {remote}')
 
     # fetch the latest changes from the remote
     if args.fetch:
-        cmd = ['git', 'fetch', remote, '-p']
-        subprocess.check_call(cmd)
+        fetch_remotes([remote])
+        state = repository_state(fields=fields)
 
     # detect the master branch name
-    master_name = detect_master_branch(remote)
+    master_name = state.master or detect_master_branch(remote)
+
+    if args.no_checkout:
+        # develop is only kept up to date for those that have it locally
+        branches = [master_name]
+        if state.develop is not None and load_ref_snapshot().has_ref(f'refs/heads/{state.develop}'):
+            branches.append(state.develop)
+        if not fast_forward_branches(remote, branches, set(checked_out_branches())):
+            sys.exit(1)
+        return
 
     # create the new branch
     cmd = ['git', 'checkout', '-B', master_name, f'{remote}/{master_name}']
-    subprocess.check_call(cmd)
+    runner.check_call(cmd)
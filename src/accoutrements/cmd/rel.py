@@ -1,20 +1,24 @@
 import argparse
-import subprocess
-from typing import Optional
+import os
+import sys
+from typing import Optional, List
 
-from accoutrements import detect_upstream_remote
-from accoutrements.config import has_signing_key
-from accoutrements.versions import next_version, VALID_MODES
+from accoutrements import aio, runner
+from accoutrements.colours import green, red, yellow
+from accoutrements.daemon import repository_state
+from accoutrements.metadata import load_metadata
+from accoutrements.release_notes import generate_release_notes
+from accoutrements.tags import current_version, load_tag_index, previous_release
+from accoutrements.versions import next_version, VALID_MODES, VersionMatchError
 
+DEFAULT_RELEASE_JOBS = 8
 
-def current_version(cwd: Optional[str] = None) -> str:
-    cmd = ['git', 'describe', '--always']
-    output = subprocess.check_output(cmd, cwd=cwd).decode().strip()
-    return output
 
-
-def create_tag(name: str, dry_run: bool = False, cwd: Optional[str] = None):
-    sign_type = '-s' if has_signing_key(cwd=cwd) else '-a'
+def create_tag(name: str, dry_run: bool = False, cwd: Optional[str] = None, signed: Optional[bool] = None,
+               message: Optional[str] = None):
+    if signed is None:
+        signed = load_metadata(cwd).signing_key
+    sign_type = '-s' if signed else '-a'
 
     # create the git tag
     if not dry_run:
@@ -23,9 +27,12 @@ def create_tag(name: str, dry_run: bool = False, cwd: Optional[str] = None):
             'tag',
             sign_type,
             name,
-            '-m', name,
         ]
-        subprocess.check_call(cmd, cwd=cwd)
+        if message is None:
+            runner.check_call(cmd + ['-m', name], cwd=cwd)
+        else:
+            # the notes can be arbitrarily long, so they are passed on stdin rather than the command line
+            runner.run(cmd + ['-F', '-'], input=message.encode(), check=True, cwd=cwd)
 
     else:
         print('DRY-RUN: Tag Version:', name)
@@ -39,7 +46,7 @@ def push_tag(remote: str, name: str, dry_run: bool = False, cwd: Optional[str] =
             remote,
             name,
         ]
-        subprocess.check_call(cmd, cwd=cwd)
+        runner.check_call(cmd, cwd=cwd)
 
     else:
         print('DRY-RUN: Push Tag Version:', name)
@@ -51,6 +58,143 @@ def determine_next_version(current_ver: str, tag: str) -> str:
     return tag
 
 
+class ReleasePlan:
+    def __init__(self, path: str, tag: str, remote: Optional[str] = None):
+        self.path = path
+        self.tag = tag
+        self.remote = remote
+        self.current: Optional[str] = None
+        self.next: Optional[str] = None
+        self.signed = False
+        self.created = False
+        self.pushed = False
+        self.error: Optional[str] = None
+
+
+def load_manifest(path: str) -> List[ReleasePlan]:
+    import toml
+
+    with open(path, 'r') as manifest_file:
+        manifest = toml.load(manifest_file)
+
+    # the repository paths are relative to the manifest, which lists them in the same way as .git-ditto.toml
+    base = os.path.dirname(os.path.abspath(path))
+    return [
+        ReleasePlan(os.path.join(base, repo['path']), repo.get('mode', 'patch'), repo.get('remote'))
+        for repo in manifest.get('repos', [])
+    ]
+
+
+def prepare_release(plan: ReleasePlan):
+    try:
+        plan.current = current_version(cwd=plan.path)
+        plan.next = determine_next_version(plan.current, plan.tag)
+        metadata = load_metadata(plan.path)
+        plan.remote = plan.remote or metadata.remote
+        plan.signed = metadata.signing_key
+    except (runner.CalledProcessError, VersionMatchError, OSError) as ex:
+        plan.error = str(ex)
+        return
+
+    if plan.next is None:
+        plan.error = f'Unable to apply {plan.tag} to {plan.current}'
+    elif plan.remote is None:
+        plan.error = 'Unable to determine the correct upstream remote'
+    elif any(name == plan.next for name, _, _ in load_tag_index(cwd=plan.path).tags):
+        plan.error = f'Tag {plan.next} already exists'
+
+
+def create_release_tag(plan: ReleasePlan):
+    try:
+        create_tag(plan.next, cwd=plan.path, signed=plan.signed)
+        plan.created = True
+    except runner.CalledProcessError as ex:
+        plan.error = str(ex)
+
+
+def delete_release_tag(plan: ReleasePlan):
+    if runner.call(['git', 'tag', '-d', plan.next], cwd=plan.path, stdout=runner.DEVNULL) == 0:
+        plan.created = False
+
+
+def push_release_tag(plan: ReleasePlan):
+    cmd = ['git', 'push', plan.remote, f'refs/tags/{plan.next}']
+    process = runner.run(cmd, cwd=plan.path, stdout=runner.PIPE, stderr=runner.PIPE)
+    if process.returncode == 0:
+        plan.pushed = True
+        return
+
+    # remove the local tag so that the release of the repository can simply be retried
+    plan.error = process.stderr.decode().strip() or 'push failed'
+    delete_release_tag(plan)
+
+
+def run_batch_release(args: argparse.Namespace):
+    from concurrent.futures import ThreadPoolExecutor
+
+    plans = load_manifest(args.manifest)
+    jobs = max(min(args.jobs, len(plans)), 1)
+
+    # step 1. work out every version up front, nothing is changed unless the whole batch can be released
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(prepare_release, plans))
+
+    base = os.path.dirname(os.path.abspath(args.manifest))
+    print(f'Release plan for {len(plans)} repositories:')
+    for plan in plans:
+        name = os.path.relpath(plan.path, base)
+        if plan.error is not None:
+            print(red(f'- {name}: {plan.error}'))
+        else:
+            sign_type = 'signed' if plan.signed else 'annotated'
+            print(f'- {name}: {plan.current} -> {yellow(plan.next)} ({sign_type}, {plan.remote})')
+    print()
+
+    if any(plan.error is not None for plan in plans):
+        print(red('Unable to release, no tags have been created'))
+        sys.exit(1)
+
+    if args.dry_run:
+        return
+
+    if not args.yes:
+        input('Press enter to continue')
+        print()
+
+    # step 2. create all the tags, if any of them fail then the others are removed again
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(create_release_tag, plans))
+
+    if any(plan.error is not None for plan in plans):
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(delete_release_tag, [plan for plan in plans if plan.created]))
+
+        for plan in plans:
+            if plan.error is not None:
+                print(red(f'{os.path.relpath(plan.path, base)}: {plan.error}'))
+        print(red('Unable to create all the tags, the release has been rolled back'))
+        sys.exit(1)
+
+    # step 3. push the tags
+    if not args.no_push:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(push_release_tag, plans))
+
+    failures = 0
+    for plan in plans:
+        name = os.path.relpath(plan.path, base)
+        if plan.error is not None:
+            failures += 1
+            print(red(f'{name}: unable to push {plan.next}: {plan.error}'))
+        elif plan.pushed:
+            print(f'{name}: {green(plan.next)} pushed to {plan.remote}')
+        else:
+            print(f'{name}: {green(plan.next)} created')
+
+    if failures > 0:
+        sys.exit(1)
+
+
 def parse_commandline() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument('tag', nargs='?', default='patch',
@@ -58,6 +202,14 @@ def parse_commandline() -> argparse.Namespace:
     parser.add_argument('-n', '--no-push', action='store_true', help='Disable pushing of the tag')
     parser.add_argument('--dry-run', action='store_true', help='Disable the going actual operations for testing')
     parser.add_argument('-w', '--working-dir', help='The working directory to be used')
+    parser.add_argument('-y', '--yes', action='store_true', help='Do not prompt for confirmation')
+    parser.add_argument('--show', action='store_true', help='Only print the current version')
+    parser.add_argument('-m', '--manifest', help='Release every repository listed in the TOML manifest')
+    parser.add_argument('--notes', action='store_true',
+                        help='Print the release notes, built from the merges since the previous release')
+    parser.add_argument('--notes-in-tag', action='store_true', help='Use the release notes as the tag message')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_RELEASE_JOBS,
+                        help='The number of repositories to release concurrently (with --manifest)')
     return parser.parse_args()
 
 
@@ -65,13 +217,31 @@ def main():
     args = parse_commandline()
     cwd = args.working_dir
 
-    current_ver = current_version()
+    if args.show:
+        version = repository_state(cwd, fields=('current_version',)).current_version
+        if version is None:
+            sys.exit(1)
+        print(version)
+        return
+
+    if args.manifest is not None:
+        run_batch_release(args)
+        return
+
+    # the tag lookup is independent of the (usually cached) repository metadata
+    metadata = load_metadata(cwd)
+    current_ver, (remote, signed) = aio.gather(
+        lambda: current_version(cwd=cwd), lambda: (metadata.remote, metadata.signing_key))
+    if remote is None:
+        print('Unable to determine the correct upstream remote')
+        sys.exit(1)
     next_ver = determine_next_version(current_ver, args.tag)
-    remote = detect_upstream_remote()
 
     print(f'Current Version: {current_ver}')
     print(f'Next Version...: {next_ver}')
     print(f'Upstream remote: {remote}')
+    if args.notes_in_tag:
+        print('Notes in tag...: Yes')
     if cwd is not None:
         print(f'Working Dir....: {cwd}')
     if args.dry_run:
@@ -79,11 +249,22 @@ def main():
     if args.no_push:
         print('No Push........: Yes')
     print()
-    input('Press enter to continue')
-    print()
+
+    message = None
+    if args.notes or args.notes_in_tag:
+        # without a release reachable from HEAD the notes cover the whole history
+        notes = generate_release_notes(previous_release(cwd=cwd), cwd=cwd)
+        print(notes.format() if len(notes) > 0 else 'No merges since the previous release')
+        print()
+        if args.notes_in_tag and len(notes) > 0:
+            message = f'{next_ver}\n\n{notes.format()}\n'
+
+    if not args.yes:
+        input('Press enter to continue')
+        print()
 
     # create the tag
-    create_tag(next_ver, dry_run=args.dry_run, cwd=cwd)
+    create_tag(next_ver, dry_run=args.dry_run, cwd=cwd, signed=signed, message=message)
 
     # push the tag
     if not args.no_push:
@@ -1,47 +1,104 @@
 #!/usr/bin/env python3
 import argparse
-import subprocess
+import sys
+from typing import Optional
 
-from accoutrements import detect_upstream_remote, detect_stale_branches
+from accoutrements import detect_upstream_remote, runner
+from accoutrements.colours import red
+from accoutrements.daemon import repository_state
+from accoutrements.fetch import fetch_remotes
+from accoutrements.refs import delete_local_branches, load_ref_snapshot
+from accoutrements.worktrees import Worktree, has_linked_worktrees, list_worktrees, remove_worktree
 
 
 def parse_commandline():
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', '--fetch', action='store_true', help='Fetch the lastest updates from the remote')
+    parser.add_argument('-y', '--yes', action='store_true', help='Do not prompt for confirmation')
+    parser.add_argument('--dry-run', action='store_true', help='Only list the branches that would be removed')
     return parser.parse_args()
 
 
+def _kept_reason(worktree: Worktree) -> Optional[str]:
+    if worktree.main:
+        return 'main worktree'
+    if worktree.locked:
+        return 'locked'
+    return None
+
+
 def main():
     args = parse_commandline()
 
     # fetch and prune if required
     if args.fetch:
-        cmd = ['git', 'fetch', '--prune', '--all']
-        subprocess.check_call(cmd)
+        fetch_remotes(load_ref_snapshot().remotes)
 
-    remote = detect_upstream_remote()
+    state = repository_state(fields=('remote', 'current_branch', 'stale_branches'))
+    remote = state.remote or detect_upstream_remote()
     print(f'Upstream remote: {remote}')
 
     # detect all the local branches that exist but no longer have an
     # upstream reference
-    stale_branches = detect_stale_branches()
-    current_branch = subprocess.check_output(['git', 'branch', '--show-current']).decode().strip()
+    stale_branches = set(state.stale_branches)
+    checked_out = state.current_branch
+
+    # the linked worktrees (other than the current one) that have a stale branch checked out are removed with it
+    stale_worktrees = []
+    if len(stale_branches) > 0 and has_linked_worktrees():
+        stale_worktrees = [
+            worktree for worktree in list_worktrees()
+            if worktree.branch in stale_branches and worktree.branch != checked_out
+        ]
+
+    if len(stale_branches) == 0:
+        print('No stale branches found')
+        return
 
     print('The following branches will be removed:')
     for branch in sorted(stale_branches):
         print('- {}'.format(branch))
     print()
-    if current_branch in stale_branches:
-        print(f'Since you are currently on `{current_branch}` you will be checkedout to the upstream master')
+    if len(stale_worktrees) > 0:
+        print('The following worktrees will be removed:')
+        for worktree in stale_worktrees:
+            reason = _kept_reason(worktree)
+            print(f'- {worktree.path}' + (f' ({reason}, the branch is kept)' if reason is not None else ''))
+        print()
+    if checked_out in stale_branches:
+        print(f'Since you are currently on `{checked_out}` you will be checkedout to the upstream master')
         print()
-    input('Press enter to continue...')
+
+    # we are dry running then stop here
+    if args.dry_run:
+        return
+
+    if not args.yes:
+        input('Press enter to continue...')
 
     # if needed checkout master if we are on this stale branch
-    if current_branch in stale_branches:
+    if checked_out in stale_branches:
         cmd = ['git', 'checkout', '-B', 'master', f'{remote}/master']
-        subprocess.check_call(cmd)
+        runner.check_call(cmd)
+
+    # a branch can not be deleted while it is still checked out in one of the worktrees
+    results = {}
+    for worktree in stale_worktrees:
+        error = _kept_reason(worktree) or remove_worktree(worktree.path)
+        if error is None:
+            print(f'Removed worktree {worktree.path}')
+        else:
+            print(red(f'Unable to remove worktree {worktree.path}: {error}'))
+            results[worktree.branch] = error
+            stale_branches.discard(worktree.branch)
 
     # delete the branches
-    for branch in stale_branches:
-        cmd = ['git', 'branch', '-D', branch]
-        subprocess.check_call(cmd)
+    results.update(delete_local_branches(stale_branches))
+    for branch, error in sorted(results.items()):
+        if error is None:
+            print(f'Deleted branch {branch}')
+        else:
+            print(red(f'Unable to delete branch {branch}: {error}'))
+
+    if any(error is not None for error in results.values()):
+        sys.exit(1)
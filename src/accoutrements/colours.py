@@ -1,7 +1,6 @@
-from colored import fg, attr
-
-
 def _wrapper(text, code):
+    # colored is only imported when some output actually needs to be coloured
+    from colored import fg, attr
     return fg(code) + text + attr(0)
 
 
@@ -1,10 +1,317 @@
-import subprocess
-from typing import Optional
+import functools
+import os
+from typing import Optional, List, Tuple, Dict, Iterable, NamedTuple
+
+from . import runner
+
+UNCHANGED = 'unchanged'
+UPDATED = 'updated'
+FAILED = 'failed'
+
+_ESCAPES = {'n': '\n', 't': '\t', 'b': '\b', '"': '"', '\\': '\\'}
+
+
+class GitConfigError(RuntimeError):
+    pass
 
 
 def has_signing_key(cwd: Optional[str] = None) -> bool:
+    from .gitdir import GitDirectory, UnsupportedLayout
+
+    try:
+        return (GitDirectory.open(cwd).user_config_value('user.signingkey') or '') != ''
+    except UnsupportedLayout:
+        pass
+
     try:
         cmd = ['git', 'config', 'user.signingkey']
-        return subprocess.check_output(cmd, cwd=cwd).decode().strip() != ''
-    except subprocess.CalledProcessError:
+        return runner.check_output(cmd, cwd=cwd).decode().strip() != ''
+    except runner.CalledProcessError:
         return False
+
+
+def _split_key(name: str) -> Tuple[str, Optional[str], str]:
+    section, _, key = name.partition('.')
+    subsection, _, key = key.rpartition('.')
+    if section == '' or key == '':
+        raise GitConfigError(f'Invalid config key: {name}')
+    return section.lower(), subsection or None, key.lower()
+
+
+def _parse_value(text: str) -> str:
+    value = []
+    pending_space = ''
+    in_quotes = False
+    index = 0
+    while index < len(text):
+        char = text[index]
+        index += 1
+
+        if char == '\\':
+            if index >= len(text):
+                raise GitConfigError('Line continuations are not supported')
+            escaped = text[index]
+            index += 1
+            if escaped not in _ESCAPES:
+                raise GitConfigError(f'Invalid escape sequence: \\{escaped}')
+            value.append(pending_space + _ESCAPES[escaped])
+            pending_space = ''
+        elif char == '"':
+            in_quotes = not in_quotes
+        elif char in '#;' and not in_quotes:
+            break
+        elif char.isspace() and not in_quotes:
+            # whitespace is only kept when it is between two parts of the value
+            if len(value) > 0:
+                pending_space += char
+        else:
+            value.append(pending_space + char)
+            pending_space = ''
+
+    if in_quotes:
+        raise GitConfigError('Unterminated quoted value')
+
+    return ''.join(value)
+
+
+def _format_value(value: str) -> str:
+    escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\t', '\\t')
+    if escaped != escaped.strip() or any(c in escaped for c in '#;'):
+        escaped = f'"{escaped}"'
+    return escaped
+
+
+def _parse_section_header(line: str) -> Tuple[str, Optional[str], str]:
+    end = line.find(']')
+    if end < 0:
+        raise GitConfigError(f'Invalid section header: {line}')
+
+    header, remainder = line[1:end].strip(), line[end + 1:]
+
+    if '"' in header:
+        name, _, subsection = header.partition(' ')
+        subsection = subsection.strip()
+        if len(subsection) < 2 or subsection[0] != '"' or subsection[-1] != '"':
+            raise GitConfigError(f'Invalid section header: {line}')
+        subsection = subsection[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    elif '.' in header:
+        # deprecated [section.subsection] syntax, the subsection is case insensitive
+        name, _, subsection = header.partition('.')
+        subsection = subsection.lower()
+    else:
+        name, subsection = header, None
+
+    return name.lower(), subsection, remainder
+
+
+class _Entry(NamedTuple):
+    section: str
+    subsection: Optional[str]
+    key: Optional[str] = None
+    value: Optional[str] = None
+
+
+class GitConfigFile:
+    """A minimal git config file reader and writer that preserves the layout of all the lines it does not modify"""
+
+    def __init__(self, path: str, lines: List[str]):
+        self._path = path
+        self._lines = lines
+        self._entries: List[Optional[_Entry]] = []
+        self._modified = False
+        self._parse()
+
+    @classmethod
+    def load(cls, path: str) -> 'GitConfigFile':
+        try:
+            with open(path, 'r') as config_file:
+                lines = config_file.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+        return cls(path, lines)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def modified(self) -> bool:
+        return self._modified
+
+    def _parse(self):
+        self._entries = []
+        section = None
+        for line in self._lines:
+            stripped = line.strip()
+
+            if stripped.startswith('['):
+                name, subsection, stripped = _parse_section_header(stripped)
+                section = _Entry(name, subsection)
+                self._entries.append(section)
+                stripped = stripped.strip()
+
+                # entries are permitted on the same line as the header, these are not supported for writing
+                if stripped != '' and stripped[0] not in '#;':
+                    raise GitConfigError(f'Unsupported config layout: {line}')
+                continue
+
+            if stripped == '' or stripped[0] in '#;':
+                self._entries.append(None)
+                continue
+
+            if section is None:
+                raise GitConfigError(f'Config entry outside of a section: {line}')
+
+            key, sep, value = stripped.partition('=')
+            key = key.strip().lower()
+            self._entries.append(_Entry(section.section, section.subsection, key, _parse_value(value) if sep else 'true'))
+
+    def _matches(self, entry: Optional[_Entry], section: str, subsection: Optional[str]) -> bool:
+        return entry is not None and entry.section == section and entry.subsection == subsection
+
+    def sections(self) -> List[Tuple[str, Optional[str]]]:
+        return [(e.section, e.subsection) for e in self._entries if e is not None and e.key is None]
+
+    def items(self) -> List[Tuple[str, str]]:
+        items = []
+        for entry in self._entries:
+            if entry is not None and entry.key is not None:
+                parts = [entry.section] + ([entry.subsection] if entry.subsection is not None else []) + [entry.key]
+                items.append(('.'.join(parts), entry.value))
+        return items
+
+    def get(self, name: str) -> Optional[str]:
+        section, subsection, key = _split_key(name)
+
+        value = None
+        for entry in self._entries:
+            if self._matches(entry, section, subsection) and entry.key == key:
+                value = entry.value  # the last value wins
+        return value
+
+    def set(self, name: str, value: str):
+        section, subsection, key = _split_key(name)
+
+        line = f'\t{key} = {_format_value(value)}'
+
+        # replace the last definition of the key if it exists
+        last_section_index = None
+        for index in reversed(range(len(self._entries))):
+            entry = self._entries[index]
+            if self._matches(entry, section, subsection):
+                if entry.key == key:
+                    self._lines[index] = line
+                    self._modified = True
+                    self._parse()
+                    return
+                if last_section_index is None:
+                    last_section_index = index
+
+        if last_section_index is not None:
+            self._lines.insert(last_section_index + 1, line)
+        else:
+            if subsection is not None:
+                escaped = subsection.replace('\\', '\\\\').replace('"', '\\"')
+                self._lines.append(f'[{section} "{escaped}"]')
+            else:
+                self._lines.append(f'[{section}]')
+            self._lines.append(line)
+
+        self._modified = True
+        self._parse()
+
+    def remove_sections(self, sections: Iterable[Tuple[str, Optional[str]]]) -> int:
+        targets = {(section.lower(), subsection) for section, subsection in sections}
+
+        keep = []
+        removed = 0
+        removing = False
+        for line, entry in zip(self._lines, self._entries):
+            if entry is not None and entry.key is None:
+                removing = (entry.section, entry.subsection) in targets
+                removed += 1 if removing else 0
+            if not removing:
+                keep.append(line)
+
+        if removed > 0:
+            self._lines = keep
+            self._modified = True
+            self._parse()
+
+        return removed
+
+    def save(self):
+        """Write the config file using the same lock file protocol as git"""
+        lock_path = self._path + '.lock'
+        try:
+            fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            raise GitConfigError(f'Unable to lock {self._path}, is another git process running?')
+
+        try:
+            with os.fdopen(fd, 'w') as lock_file:
+                lock_file.write('\n'.join(self._lines) + '\n')
+            try:
+                os.chmod(lock_path, os.stat(self._path).st_mode & 0o7777)
+            except FileNotFoundError:
+                pass
+            os.replace(lock_path, self._path)
+        except BaseException:
+            os.unlink(lock_path)
+            raise
+
+        self._modified = False
+
+
+def git_common_dir(cwd: Optional[str] = None) -> str:
+    return _git_common_dir(os.path.abspath(cwd or os.getcwd()))
+
+
+@functools.lru_cache(maxsize=None)
+def _git_common_dir(cwd: str) -> str:
+    from .gitdir import find_git_dirs, UnsupportedLayout
+
+    try:
+        return find_git_dirs(cwd)[1]
+    except UnsupportedLayout:
+        pass
+
+    cmd = ['git', 'rev-parse', '--git-common-dir']
+    output = runner.check_output(cmd, cwd=cwd).decode().strip()
+    return os.path.join(cwd, output)
+
+
+def repo_config_path(repo_path: str) -> str:
+    if not os.path.exists(os.path.join(repo_path, '.git')):
+        raise GitConfigError(f'Not a git repository: {repo_path}')
+
+    # worktrees and submodules use a `gitdir: <path>` file, the config itself lives in the common dir
+    try:
+        return os.path.join(git_common_dir(repo_path), 'config')
+    except runner.CalledProcessError:
+        raise GitConfigError(f'Unable to find the git directory of {repo_path}')
+
+
+class ConfigUpdateResult(NamedTuple):
+    status: str
+    changes: Optional[Dict[str, str]] = None
+    error: Optional[str] = None
+
+
+def update_repo_config(repo_path: str, values: Dict[str, str]) -> ConfigUpdateResult:
+    """Apply the config values to the repository, only writing the file if one of the values has changed"""
+    try:
+        config = GitConfigFile.load(repo_config_path(repo_path))
+
+        changes = {name: value for name, value in values.items() if config.get(name) != value}
+        if len(changes) == 0:
+            return ConfigUpdateResult(UNCHANGED)
+
+        for name, value in changes.items():
+            config.set(name, value)
+        config.save()
+
+        return ConfigUpdateResult(UPDATED, changes)
+
+    except (GitConfigError, OSError) as ex:
+        return ConfigUpdateResult(FAILED, error=str(ex))
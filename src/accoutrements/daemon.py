@@ -0,0 +1,205 @@
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from . import detect_develop_branch, detect_master_branch, find_upstream_remote, runner
+from .gitdir import UNSUPPORTED_ENV, UnsupportedLayout, find_git_dirs, path_fingerprint
+from .refs import current_branch, invalidate_ref_snapshot, iter_stale_branches
+from .tags import current_version
+
+DAEMON_ENV = 'ACCOUTREMENTS_DAEMON'
+SOCKET_ENV = 'ACCOUTREMENTS_DAEMON_SOCKET'
+SOCKET_FILENAME = 'git-accoutrements.sock'
+CLIENT_TIMEOUT = 1.0
+
+
+class RepositoryState(NamedTuple):
+    remote: Optional[str]
+    master: Optional[str]
+    develop: Optional[str]
+    current_branch: Optional[str]
+    stale_branches: List[str]
+    current_version: Optional[str]
+
+
+def socket_path() -> str:
+    if SOCKET_ENV in os.environ:
+        return os.environ[SOCKET_ENV]
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, SOCKET_FILENAME)
+
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'git-accoutrements', SOCKET_FILENAME)
+
+
+def compute_state(cwd: Optional[str] = None, fields: Iterable[str] = RepositoryState._fields) -> RepositoryState:
+    """Work out the state of the repository from scratch, only the requested fields are filled in"""
+    fields = set(fields)
+    state = dict.fromkeys(RepositoryState._fields)
+    state['stale_branches'] = []
+
+    remote = None
+    if len(fields & {'remote', 'master', 'develop'}) > 0:
+        remote = state['remote'] = find_upstream_remote(cwd)
+    if remote is not None and 'master' in fields:
+        try:
+            state['master'] = detect_master_branch(remote, cwd=cwd)
+        except RuntimeError:
+            pass
+    if remote is not None and 'develop' in fields:
+        state['develop'] = detect_develop_branch(remote, cwd=cwd)
+
+    if 'current_branch' in fields:
+        state['current_branch'] = current_branch(cwd)
+    if 'stale_branches' in fields:
+        state['stale_branches'] = list(iter_stale_branches(cwd))
+    if 'current_version' in fields:
+        try:
+            state['current_version'] = current_version(cwd=cwd)
+        except runner.CalledProcessError:
+            pass  # i.e. a repository without any commits
+
+    return RepositoryState(**state)
+
+
+def query_daemon(request: dict, path: Optional[str] = None, timeout: float = CLIENT_TIMEOUT) -> Optional[dict]:
+    """Send a request to the daemon, returning None when it is not running (or does not answer in time)"""
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+
+    import json
+    import socket
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(path)
+            client.sendall(json.dumps(request).encode() + b'\n')
+
+            response = b''
+            while not response.endswith(b'\n'):
+                chunk = client.recv(65536)
+                if chunk == b'':
+                    break
+                response += chunk
+
+        return json.loads(response.decode())
+    except (OSError, ValueError):
+        return None
+
+
+def repository_state(cwd: Optional[str] = None, fields: Iterable[str] = RepositoryState._fields) -> RepositoryState:
+    """The state of the repository, from the daemon when it is running, otherwise the fields are computed locally"""
+    # the daemon can only answer for repositories that it would find in the same way as this process
+    use_daemon = os.environ.get(DAEMON_ENV, '1') != '0' and not any(name in os.environ for name in UNSUPPORTED_ENV)
+    if use_daemon:
+        response = query_daemon({'command': 'state', 'cwd': os.path.abspath(cwd or os.getcwd())})
+        if response is not None and response.get('state') is not None:
+            return RepositoryState(**response['state'])
+
+    return compute_state(cwd, fields)
+
+
+def _watched_paths(git_dir: str, common_dir: str) -> List[str]:
+    # any change to a ref either rewrites packed-refs or replaces a file in one of the ref folders, which always updates
+    # the modification time of that folder
+    paths = [
+        os.path.join(git_dir, 'HEAD'),
+        os.path.join(common_dir, 'config'),
+        os.path.join(git_dir, 'config.worktree'),
+        os.path.join(common_dir, 'packed-refs'),
+        os.path.join(common_dir, 'reftable'),
+    ]
+    for base in sorted({git_dir, common_dir}):
+        for folder, _, _ in os.walk(os.path.join(base, 'refs')):
+            paths.append(folder)
+    return paths
+
+
+class StateCache:
+    """The state of each repository that has been queried, recomputed whenever the files in `.git` change"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._repository_locks: Dict[str, threading.Lock] = {}
+        self._entries: Dict[str, Tuple[List[str], str, RepositoryState]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _repository_lock(self, git_dir: str) -> threading.Lock:
+        with self._lock:
+            return self._repository_locks.setdefault(git_dir, threading.Lock())
+
+    def get(self, cwd: str) -> RepositoryState:
+        git_dir, common_dir = find_git_dirs(cwd)
+
+        # computing the state can query a remote, so a slow repository only holds up the requests for itself
+        with self._repository_lock(git_dir):
+            entry = self._entries.get(git_dir)
+            if entry is not None and path_fingerprint(entry[0]) == entry[1]:
+                with self._lock:
+                    self.hits += 1
+                return entry[2]
+
+            # the fingerprint is taken before reading, so a change part way through is picked up by the next request
+            paths = _watched_paths(git_dir, common_dir)
+            fingerprint = path_fingerprint(paths)
+            invalidate_ref_snapshot()
+            state = compute_state(cwd)
+
+            with self._lock:
+                self._entries[git_dir] = (paths, fingerprint, state)
+                self.misses += 1
+            return state
+
+
+def serve(path: Optional[str] = None):
+    """Run the daemon in the foreground until it is asked to stop"""
+    import json
+    import socketserver
+
+    path = path or socket_path()
+    cache = StateCache()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                request = json.loads(self.rfile.readline().decode())
+                command = request.get('command')
+                if command == 'state':
+                    response = {'state': cache.get(request['cwd'])._asdict()}
+                elif command == 'status':
+                    response = {'pid': os.getpid(), 'repositories': len(cache), 'hits': cache.hits,
+                                'misses': cache.misses}
+                elif command == 'stop':
+                    response = {'stopping': True}
+                    threading.Thread(target=self.server.shutdown).start()
+                else:
+                    response = {'error': f'Unknown command: {command}'}
+            except UnsupportedLayout as ex:
+                # the client works the state out for itself
+                response = {'error': str(ex)}
+            except Exception as ex:
+                response = {'error': f'{type(ex).__name__}: {ex}'}
+
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+    previous_umask = os.umask(0o077)  # only the owner may connect
+    try:
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    finally:
+        os.umask(previous_umask)
+
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(path)
@@ -0,0 +1,223 @@
+import fnmatch
+import os
+import re
+import threading
+from collections import deque
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+# scandir mostly holds the GIL on a warm cache, so threads only pay off with several CPUs. With a single CPU the serial
+# walk is faster (benchmarks/run.py, 10k checkouts: scan-jobs-1 0.53s vs scan-jobs-8 0.65s)
+DEFAULT_SCAN_JOBS = min(8, os.cpu_count() or 1)
+
+SCAN_DIR_EXCEPTIONS = {
+    'node_modules',
+}
+
+# (is the folder a git repo, the list of sub folders that should be scanned next)
+ScanResult = Tuple[bool, List[str]]
+ScanFunction = Callable[[str], ScanResult]
+
+
+class ScanRules(NamedTuple):
+    # glob patterns, matched against the folder name or (when they contain a `/`) the path relative to the scan root
+    prune: Sequence[str] = ()
+    max_depth: Optional[int] = None
+    one_file_system: bool = False
+
+    @property
+    def key(self) -> str:
+        """A stable description of the rules, scans with different rules are indexed separately"""
+        return f'prune={",".join(sorted(self.prune))};max_depth={self.max_depth};xdev={self.one_file_system}'
+
+
+class ScanStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.visited = 0
+        self.cached = 0
+        self.pruned = 0
+        self.loops = 0
+        self.boundaries = 0
+        self.unreadable = 0
+
+    def add(self, **counts: int):
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def __str__(self) -> str:
+        return (f'{self.visited} folders visited ({self.cached} unchanged since the last scan), {self.pruned} pruned, '
+                f'{self.loops} loops, {self.boundaries} on other file systems, {self.unreadable} unreadable')
+
+
+def _compile_patterns(patterns: Sequence[str]) -> Tuple[Optional[re.Pattern], Optional[re.Pattern]]:
+    names = [pattern for pattern in patterns if '/' not in pattern]
+    paths = [pattern.strip('/') for pattern in patterns if '/' in pattern]
+
+    def compile_all(group: List[str]) -> Optional[re.Pattern]:
+        return re.compile('|'.join(fnmatch.translate(pattern) for pattern in group)) if len(group) > 0 else None
+
+    return compile_all(names), compile_all(paths)
+
+
+def _is_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+class Scanner:
+    """Scans one folder at a time, applying the pruning rules, the depth limit and symlink loop detection"""
+
+    def __init__(self, root: str, deep: bool = False, rules: Optional[ScanRules] = None,
+                 stats: Optional[ScanStats] = None):
+        self._root = root
+        self._deep = deep
+        self._rules = rules or ScanRules()
+        self._name_pattern, self._path_pattern = _compile_patterns(list(SCAN_DIR_EXCEPTIONS) + list(self._rules.prune))
+        self._device = os.stat(root).st_dev if self._rules.one_file_system else None
+        self._seen: Set[Tuple[int, int]] = set()
+        self._lock = threading.Lock()
+        self.stats = stats or ScanStats()
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self._root).replace(os.sep, '/')
+
+    def _depth(self, path: str) -> int:
+        relative = self._relative(path)
+        return 0 if relative == '.' else relative.count('/') + 1
+
+    def _is_pruned(self, entry: os.DirEntry) -> bool:
+        if self._name_pattern is not None and self._name_pattern.match(entry.name):
+            return True
+        return self._path_pattern is not None and self._path_pattern.match(self._relative(entry.path)) is not None
+
+    def __call__(self, path: str) -> ScanResult:
+        # a folder that can be reached more than once (i.e. through a symlink back up the tree) is only scanned once
+        try:
+            info = os.stat(path)
+        except OSError:
+            self.stats.add(unreadable=1)
+            return False, []
+
+        with self._lock:
+            if (info.st_dev, info.st_ino) in self._seen:
+                self.stats.add(loops=1)
+                return False, []
+            self._seen.add((info.st_dev, info.st_ino))
+
+        if self._device is not None and info.st_dev != self._device:
+            self.stats.add(boundaries=1)
+            return False, []
+
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except PermissionError:
+            print(f'Unable to read folder {path}')
+            self.stats.add(unreadable=1)
+            return False, []
+        except OSError:
+            self.stats.add(unreadable=1)
+            return False, []
+
+        is_repo = False
+        has_git_modules = False
+        pruned = 0
+        children = []
+        for entry in entries:
+            name = entry.name
+
+            if name == '.git':
+                is_repo = _is_dir(entry)
+            elif name == '.gitmodules':
+                has_git_modules = True
+            elif name.startswith('.') or not _is_dir(entry):
+                continue
+            elif self._is_pruned(entry):
+                pruned += 1
+            else:
+                children.append(entry.path)
+
+        # Determine if we should stop processing this branch. In the answer to this should be yes since we have found a
+        # git repo. However, if there are git modules then we should continue the search down. Alternatively if the
+        # user has specified the deep flag we continue searching
+        if is_repo and not (has_git_modules or self._deep):
+            children = []
+
+        if self._rules.max_depth is not None and self._depth(path) >= self._rules.max_depth:
+            pruned += len(children)
+            children = []
+
+        self.stats.add(visited=1, pruned=pruned)
+        return is_repo, children
+
+
+def scan_directory(path: str, deep: bool = False) -> ScanResult:
+    return Scanner(path, deep=deep)(path)
+
+
+def _walk_serial(path: str, scan: ScanFunction) -> Iterator[str]:
+    scan_list = deque([path])
+    while len(scan_list) > 0:
+        current = scan_list.popleft()
+
+        is_repo, children = scan(current)
+        if is_repo:
+            yield current
+
+        scan_list.extend(children)
+
+
+def _walk_parallel(path: str, scan: ScanFunction, jobs: int) -> Iterator[str]:
+    import queue
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    results = queue.Queue()
+    stopped = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        def visit(current: str):
+            try:
+                is_repo, children = scan(current)
+            except BaseException as ex:
+                results.put((ex, -1))
+                return
+
+            # Schedule the sub folders before reporting back so the walk continues while the results are consumed. The
+            # additional work must be announced before it is submitted, so that the outstanding count never drops to
+            # zero early
+            if not stopped.is_set() and len(children) > 0:
+                results.put((None, len(children)))
+                for child in children:
+                    pool.submit(visit, child)
+
+            results.put((current if is_repo else None, -1))
+
+        try:
+            pool.submit(visit, path)
+
+            outstanding = 1
+            while outstanding > 0:
+                result, delta = results.get()
+                outstanding += delta
+
+                if isinstance(result, BaseException):
+                    raise result
+                elif result is not None:
+                    yield result
+        finally:
+            stopped.set()
+
+
+def discover_repositories(path: str, deep: bool = False, jobs: int = DEFAULT_SCAN_JOBS,
+                          scan: ScanFunction = None, rules: Optional[ScanRules] = None) -> Iterator[str]:
+    """Generate the path of each git repository found under the specified path, as soon as it is found"""
+    if scan is None:
+        scan = Scanner(path, deep=deep, rules=rules)
+
+    if jobs <= 1:
+        return _walk_serial(path, scan)
+    return _walk_parallel(path, scan, jobs)
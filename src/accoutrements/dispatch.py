@@ -0,0 +1,75 @@
+import importlib
+import os
+import sys
+
+# The command modules are only imported once the command to run is known, so that each entry point only pays for the
+# imports it actually needs
+COMMANDS = {
+    'bugfix': 'accoutrements.cmd.bugfix',
+    'cache': 'accoutrements.cmd.cache',
+    'chore': 'accoutrements.cmd.chore',
+    'daemon': 'accoutrements.cmd.daemon',
+    'del': 'accoutrements.cmd.del',
+    'ditto': 'accoutrements.cmd.ditto',
+    'feature': 'accoutrements.cmd.feature',
+    'fetch': 'accoutrements.cmd.fetch',
+    'fleet': 'accoutrements.cmd.fleet',
+    'master': 'accoutrements.cmd.master',
+    'rel': 'accoutrements.cmd.rel',
+    'tidy': 'accoutrements.cmd.tidy',
+}
+
+
+def load_command(name: str):
+    return importlib.import_module(COMMANDS[name]).main
+
+
+def _extract_trace_option():
+    # `--trace` / `--trace=<path>` is accepted by every command, in addition to the ACCOUTREMENTS_TRACE variable
+    for index, arg in enumerate(sys.argv[1:], start=1):
+        if arg == '--trace' or arg.startswith('--trace='):
+            del sys.argv[index]
+
+            from . import runner
+            runner.enable_tracing(arg[len('--trace='):] or None)
+            return
+
+
+def run(name: str):
+    # present the command with the same argv that it would have had as a standalone script
+    sys.argv[0] = f'git-{name}'
+    _extract_trace_option()
+    return load_command(name)()
+
+
+def main():
+    """Entry point for `git-accoutrements <command>` and `python -m accoutrements <command>`"""
+    name = os.path.basename(sys.argv[0])
+    if name.startswith('git-') and name[len('git-'):] in COMMANDS:
+        return run(name[len('git-'):])
+
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(f'Usage: git-accoutrements <{"|".join(sorted(COMMANDS))}> [args...]')
+        sys.exit(1)
+
+    name = sys.argv.pop(1)
+    return run(name)
+
+
+def _entry_point(name: str):
+    def entry_point():
+        return run(name)
+
+    entry_point.__name__ = name
+    return entry_point
+
+
+bugfix = _entry_point('bugfix')
+chore = _entry_point('chore')
+delete = _entry_point('del')
+ditto = _entry_point('ditto')
+feature = _entry_point('feature')
+fleet = _entry_point('fleet')
+master = _entry_point('master')
+rel = _entry_point('rel')
+tidy = _entry_point('tidy')
@@ -0,0 +1,98 @@
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+from . import runner
+from .refs import invalidate_ref_snapshot
+from .state import load_state, save_state
+
+FETCH_STATE = 'fetch.json'
+FETCH_TTL_ENV = 'ACCOUTREMENTS_FETCH_TTL'
+FETCH_FINGERPRINT_ENV = 'ACCOUTREMENTS_FETCH_FINGERPRINT'
+DEFAULT_FETCH_TTL = 60.0
+
+
+def fetch_ttl() -> float:
+    try:
+        return float(os.environ.get(FETCH_TTL_ENV, DEFAULT_FETCH_TTL))
+    except ValueError:
+        return DEFAULT_FETCH_TTL
+
+
+def fingerprint_enabled() -> bool:
+    return os.environ.get(FETCH_FINGERPRINT_ENV, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def remote_fingerprint(remote: str, cwd: Optional[str] = None) -> Optional[str]:
+    """A hash of all the refs advertised by the remote, without downloading any objects"""
+    import hashlib
+
+    cmd = ['git', 'ls-remote', remote]
+    try:
+        output = runner.check_output(cmd, cwd=cwd, stderr=runner.DEVNULL)
+    except runner.CalledProcessError:
+        return None
+    return hashlib.sha1(output).hexdigest()
+
+
+def _stale_remotes(remotes: List[str], state: Dict[str, dict], ttl: float, fingerprints: Dict[str, Optional[str]],
+                   cwd: Optional[str] = None) -> List[str]:
+    now = time.time()
+
+    # remotes that have been fetched within the TTL are considered fresh
+    candidates = [remote for remote in remotes if now - state.get(remote, {}).get('time', 0) >= ttl]
+
+    if fingerprint_enabled() and len(candidates) > 0:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=len(candidates)) as pool:
+            fingerprints.update(zip(candidates, pool.map(lambda r: remote_fingerprint(r, cwd=cwd), candidates)))
+
+        # remotes whose refs have not changed since the last fetch do not need to be fetched again
+        unchanged = [
+            remote for remote in candidates
+            if fingerprints[remote] is not None and fingerprints[remote] == state.get(remote, {}).get('fingerprint')
+        ]
+        for remote in unchanged:
+            state[remote]['time'] = now
+
+        candidates = [remote for remote in candidates if remote not in unchanged]
+
+    return candidates
+
+
+def fetch_remotes(remotes: Iterable[str], prune: bool = True, force: bool = False, ttl: Optional[float] = None,
+                  cwd: Optional[str] = None) -> List[str]:
+    """Fetch the remotes that are not already fresh (in parallel), returning the list of remotes that were fetched"""
+    remotes = list(sorted(set(remotes)))
+    ttl = fetch_ttl() if ttl is None else ttl
+
+    state = load_state(FETCH_STATE, cwd=cwd)
+    fingerprints: Dict[str, Optional[str]] = {}
+    stale = remotes if force else _stale_remotes(remotes, state, ttl, fingerprints, cwd=cwd)
+
+    skipped = [remote for remote in remotes if remote not in stale]
+    if len(skipped) > 0:
+        print(f'Skipping fetch of up to date remotes: {", ".join(skipped)}')
+
+    if len(stale) > 0:
+        # git fetches multiple remotes in parallel itself, which keeps FETCH_HEAD and the ref updates consistent
+        cmd = ['git', 'fetch', '--multiple', f'--jobs={len(stale)}']
+        if prune:
+            cmd.append('--prune')
+        runner.check_call(cmd + stale, cwd=cwd)
+        invalidate_ref_snapshot()
+
+        now = time.time()
+        for remote in stale:
+            entry = {'time': now}
+            if fingerprints.get(remote) is not None:
+                entry['fingerprint'] = fingerprints[remote]
+            state[remote] = entry
+
+    try:
+        save_state(FETCH_STATE, state, cwd=cwd)
+    except OSError:
+        pass  # the freshness information is only an optimisation
+
+    return stale
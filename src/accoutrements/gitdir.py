@@ -0,0 +1,375 @@
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import GitConfigFile, GitConfigError
+
+SUPPORTED_FORMAT_VERSIONS = (None, '0', '1')
+MAX_SYMREF_DEPTH = 5
+
+# when any of these are set git finds the repository (or its config) somewhere other than the usual places
+UNSUPPORTED_ENV = (
+    'GIT_DIR', 'GIT_COMMON_DIR', 'GIT_WORK_TREE', 'GIT_CEILING_DIRECTORIES', 'GIT_DISCOVERY_ACROSS_FILESYSTEM',
+    'GIT_NAMESPACE', 'GIT_CONFIG', 'GIT_CONFIG_PARAMETERS', 'GIT_CONFIG_COUNT',
+)
+
+
+class UnsupportedLayout(RuntimeError):
+    """The repository can not be read in-process, the git CLI must be used instead"""
+
+
+def _is_git_dir(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, 'HEAD')) and os.path.isdir(os.path.join(path, 'objects'))
+
+
+def _read_gitdir_file(path: str) -> str:
+    with open(path, 'r') as git_file:
+        prefix, _, git_dir = git_file.read().strip().partition('gitdir:')
+    if prefix != '' or git_dir.strip() == '':
+        raise UnsupportedLayout(f'Unable to parse {path}')
+    return os.path.join(os.path.dirname(path), git_dir.strip())
+
+
+def find_git_dirs(cwd: Optional[str] = None) -> Tuple[str, str]:
+    """Find the git dir and the common dir of the repository containing `cwd`, in the same way as git"""
+    if any(name in os.environ for name in UNSUPPORTED_ENV):
+        raise UnsupportedLayout('The repository location is overridden by the environment')
+
+    try:
+        path = os.path.abspath(cwd or os.getcwd())
+        device = os.stat(path).st_dev
+        while True:
+            if _is_git_dir(path):
+                raise UnsupportedLayout(f'{path} is inside the git directory')
+
+            dot_git = os.path.join(path, '.git')
+            if os.path.isdir(dot_git):
+                git_dir = dot_git
+                break
+            if os.path.isfile(dot_git):
+                git_dir = _read_gitdir_file(dot_git)
+                break
+
+            # git does not look past the root or across file systems
+            parent = os.path.dirname(path)
+            if parent == path or os.stat(parent).st_dev != device:
+                raise UnsupportedLayout(f'Unable to find the repository for {cwd}')
+            path = parent
+
+        common_dir = git_dir
+        common_dir_path = os.path.join(git_dir, 'commondir')
+        if os.path.isfile(common_dir_path):
+            with open(common_dir_path, 'r') as common_dir_file:
+                common_dir = os.path.join(git_dir, common_dir_file.read().strip())
+
+    except OSError as ex:
+        raise UnsupportedLayout(str(ex))
+
+    if not os.path.isfile(os.path.join(git_dir, 'HEAD')) or not _is_git_dir(common_dir):
+        raise UnsupportedLayout(f'{git_dir} is not a valid git directory')
+
+    return os.path.normpath(git_dir), os.path.normpath(common_dir)
+
+
+def _load_config(paths: List[str], config: Dict[str, List[str]]):
+    for path in paths:
+        try:
+            config_file = GitConfigFile.load(path)
+        except (GitConfigError, OSError) as ex:
+            raise UnsupportedLayout(f'Unable to read {path}: {ex}')
+
+        # the included files would have to be resolved in exactly the same way as git does, leave that to git
+        if any(section in ('include', 'includeif') for section, _ in config_file.sections()):
+            raise UnsupportedLayout(f'{path} includes other config files')
+
+        for name, value in config_file.items():
+            config.setdefault(name, []).append(value)
+
+
+def user_config_paths() -> List[str]:
+    """The system and global config files, in the order that git reads them"""
+    paths = []
+    if 'GIT_CONFIG_NOSYSTEM' not in os.environ:
+        paths.append(os.environ.get('GIT_CONFIG_SYSTEM', '/etc/gitconfig'))
+
+    if 'GIT_CONFIG_GLOBAL' in os.environ:
+        paths.append(os.environ['GIT_CONFIG_GLOBAL'])
+    else:
+        xdg_config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+        paths.append(os.path.join(xdg_config_home, 'git', 'config'))
+        paths.append(os.path.join(os.path.expanduser('~'), '.gitconfig'))
+
+    return paths
+
+
+def path_fingerprint(paths: List[str]) -> str:
+    """A cheap fingerprint of the files and folders, which changes whenever one of them is modified, added or removed"""
+    parts = []
+    for path in paths:
+        try:
+            info = os.stat(path)
+            parts.append(f'{info.st_mtime_ns}:{info.st_size}:{info.st_ino}')
+        except FileNotFoundError:
+            parts.append('-')
+    return '|'.join(parts)
+
+
+def _map_refspec(refspec: str, ref: str) -> Optional[str]:
+    src, sep, dst = refspec.lstrip('+').partition(':')
+    if src.startswith('^') or sep == '' or dst == '':
+        return None
+
+    if '*' not in src:
+        return dst if src == ref else None
+
+    prefix, _, suffix = src.partition('*')
+    if len(ref) < len(prefix) + len(suffix) or not ref.startswith(prefix) or not ref.endswith(suffix):
+        return None
+    return dst.replace('*', ref[len(prefix):len(ref) - len(suffix)], 1)
+
+
+def _bisect_packed_refs(data, start: int, refname: bytes) -> bool:
+    # the same binary search over the sorted lines of packed-refs as git itself, so only a few pages are ever read
+    low, high = start, len(data)
+    while low < high:
+        middle = (low + high) // 2
+        line_start = max(data.rfind(b'\n', start, middle) + 1, start)
+        line_end = data.find(b'\n', line_start)
+        line_end = len(data) if line_end == -1 else line_end
+
+        # a peeled line belongs to the ref on the line before it
+        ref_start, ref_end = line_start, line_end
+        if data[line_start:line_start + 1] == b'^':
+            ref_start, ref_end = max(data.rfind(b'\n', start, line_start - 1) + 1, start), line_start - 1
+
+        name = data[ref_start:ref_end].partition(b' ')[2]
+        if name == refname:
+            return True
+        if name < refname:
+            low = line_end + 1
+        else:
+            high = ref_start
+    return False
+
+
+class GitDirectory:
+    """An in-process reader for the config, refs and HEAD of a repository that uses the default `files` layout"""
+
+    def __init__(self, git_dir: str, common_dir: str):
+        self._git_dir = git_dir
+        self._common_dir = common_dir
+        self._config: Dict[str, List[str]] = {}
+        _load_config([os.path.join(common_dir, 'config')], self._config)
+
+        if self.config_value('core.repositoryformatversion') not in SUPPORTED_FORMAT_VERSIONS:
+            raise UnsupportedLayout('Unsupported repository format version')
+        if self.config_value('extensions.refstorage') not in (None, 'files'):
+            raise UnsupportedLayout('Unsupported ref storage')
+        if os.path.exists(os.path.join(common_dir, 'reftable')):
+            raise UnsupportedLayout('Unsupported ref storage')
+
+        # `git sparse-checkout` in a linked worktree turns this on, the worktree config then overrides the shared one
+        if (self.config_value('extensions.worktreeconfig') or 'false').lower() in ('true', 'yes', 'on', '1'):
+            _load_config([os.path.join(git_dir, 'config.worktree')], self._config)
+
+        # remotes can also be defined by the legacy files in `remotes/` and `branches/`
+        for legacy in ('remotes', 'branches'):
+            legacy_path = os.path.join(common_dir, legacy)
+            if os.path.isdir(legacy_path) and len(os.listdir(legacy_path)) > 0:
+                raise UnsupportedLayout(f'Legacy remote definitions in {legacy_path}')
+
+    @classmethod
+    def open(cls, cwd: Optional[str] = None) -> 'GitDirectory':
+        return cls(*find_git_dirs(cwd))
+
+    @property
+    def git_dir(self) -> str:
+        return self._git_dir
+
+    @property
+    def common_dir(self) -> str:
+        return self._common_dir
+
+    def config_value(self, name: str) -> Optional[str]:
+        values = self._config.get(name)
+        return values[-1] if values else None
+
+    def config_values(self, name: str) -> List[str]:
+        return list(self._config.get(name, []))
+
+    def user_config_value(self, name: str) -> Optional[str]:
+        """Look up a value in the same way as `git config <name>`, including the global and system config"""
+        config: Dict[str, List[str]] = {}
+        _load_config(user_config_paths(), config)
+        values = config.get(name, []) + self._config.get(name, [])
+        return values[-1] if values else None
+
+    def remotes(self) -> List[str]:
+        remotes = []
+        for name in self._config:
+            section, _, remainder = name.partition('.')
+            remote, _, _ = remainder.rpartition('.')
+            if section == 'remote' and remote != '' and remote not in remotes:
+                remotes.append(remote)
+        return sorted(remotes)
+
+    def upstream(self, branch: str) -> str:
+        """The full name of the upstream ref of the branch (empty if there is none), like `%(upstream)`"""
+        remote = self.config_value(f'branch.{branch}.remote')
+        merge = self.config_value(f'branch.{branch}.merge')
+        if remote is None or merge is None:
+            return ''
+        if remote == '.':
+            return merge
+
+        for refspec in self.config_values(f'remote.{remote}.fetch'):
+            mapped = _map_refspec(refspec, merge)
+            if mapped is not None:
+                return mapped
+        return ''
+
+    def head(self) -> Optional[str]:
+        """The name of the branch that is checked out, or None when the HEAD is detached"""
+        try:
+            with open(os.path.join(self._git_dir, 'HEAD'), 'r') as head_file:
+                head = head_file.read().strip()
+        except OSError as ex:
+            raise UnsupportedLayout(str(ex))
+
+        if head.startswith('ref: refs/heads/'):
+            return head[len('ref: refs/heads/'):]
+        if head.startswith('ref: '):
+            raise UnsupportedLayout(f'Unsupported HEAD: {head}')
+        return None
+
+    def symref(self, refname: str) -> Optional[str]:
+        """The target of a symbolic ref (i.e. `refs/remotes/origin/HEAD`), or None if it is not one"""
+        try:
+            with open(os.path.join(self._common_dir, refname), 'r') as ref_file:
+                contents = ref_file.read().strip()
+        except FileNotFoundError:
+            return None  # symbolic refs are never packed
+        except OSError as ex:
+            raise UnsupportedLayout(str(ex))
+
+        return contents[len('ref: '):] if contents.startswith('ref: ') else None
+
+    def _read_packed_refs(self, refs: Dict[str, str]):
+        try:
+            with open(os.path.join(self._common_dir, 'packed-refs'), 'r') as packed_file:
+                for line in packed_file:
+                    if line.startswith('#') or line.startswith('^'):
+                        continue  # the header and peeled tags
+                    objectname, _, refname = line.rstrip('\n').partition(' ')
+                    refs[refname] = objectname
+        except FileNotFoundError:
+            pass
+
+    def _iter_packed_refnames(self, prefix: str) -> Iterator[str]:
+        try:
+            with open(os.path.join(self._common_dir, 'packed-refs'), 'r') as packed_file:
+                sorted_refs = False
+                for line in packed_file:
+                    if line.startswith('#'):
+                        sorted_refs = ' sorted' in line
+                        continue
+                    if line.startswith('^'):
+                        continue
+
+                    refname = line.rstrip('\n').partition(' ')[2]
+                    if refname.startswith(prefix):
+                        yield refname
+                    elif sorted_refs and refname > prefix:
+                        return  # all of the matching refs have been seen
+        except FileNotFoundError:
+            pass
+
+    def _has_packed_ref(self, refname: str) -> bool:
+        import mmap
+
+        try:
+            with open(os.path.join(self._common_dir, 'packed-refs'), 'rb') as packed_file:
+                header = packed_file.readline()
+                if not header.startswith(b'# pack-refs with:') or b' sorted' not in header:
+                    return any(name == refname for name in self._iter_packed_refnames(refname))
+                if os.fstat(packed_file.fileno()).st_size == len(header):
+                    return False
+
+                with mmap.mmap(packed_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return _bisect_packed_refs(data, len(header), refname.encode())
+        except FileNotFoundError:
+            return False
+
+    def has_ref(self, refname: str) -> bool:
+        """Check for a single ref, without reading all of the others"""
+        try:
+            if os.path.isfile(os.path.join(self._common_dir, refname)):
+                return True
+            return self._has_packed_ref(refname)
+        except OSError as ex:
+            raise UnsupportedLayout(str(ex))
+
+    def iter_branches(self) -> Iterator[str]:
+        """Generate the names of the local branches in refname order, streaming the packed refs"""
+        import heapq
+
+        base = os.path.join(self._common_dir, 'refs', 'heads')
+        try:
+            loose = sorted(
+                os.path.relpath(os.path.join(folder, filename), self._common_dir).replace(os.sep, '/')
+                for folder, _, filenames in os.walk(base) for filename in filenames if not filename.endswith('.lock')
+            )
+        except OSError as ex:
+            raise UnsupportedLayout(str(ex))
+
+        previous = None
+        for refname in heapq.merge(loose, self._iter_packed_refnames('refs/heads/')):
+            if refname != previous:
+                yield refname[len('refs/heads/'):]
+            previous = refname
+
+    def _read_loose_refs(self, base: str, refs: Dict[str, str], symrefs: Dict[str, str]):
+        for folder, _, filenames in os.walk(os.path.join(base, 'refs')):
+            for filename in filenames:
+                if filename.endswith('.lock'):
+                    continue
+
+                path = os.path.join(folder, filename)
+                refname = os.path.relpath(path, base).replace(os.sep, '/')
+                try:
+                    with open(path, 'r') as ref_file:
+                        contents = ref_file.read().strip()
+                except (FileNotFoundError, UnicodeDecodeError):
+                    continue  # removed while reading or not a ref at all
+
+                if contents.startswith('ref: '):
+                    symrefs[refname] = contents[len('ref: '):]
+                elif len(contents) in (40, 64):
+                    refs[refname] = contents
+
+    def read_refs(self) -> Dict[str, str]:
+        """Read all the refs, with the loose refs taking priority over the packed ones, like `git for-each-ref`"""
+        refs: Dict[str, str] = {}
+        symrefs: Dict[str, str] = {}
+        try:
+            self._read_packed_refs(refs)
+            for base in sorted({self._common_dir, self._git_dir}):
+                self._read_loose_refs(base, refs, symrefs)
+        except OSError as ex:
+            raise UnsupportedLayout(str(ex))
+
+        for refname, target in symrefs.items():
+            depth = 0
+            while target in symrefs and depth < MAX_SYMREF_DEPTH:
+                target = symrefs[target]
+                depth += 1
+            if target in refs:
+                refs[refname] = refs[target]
+
+        return refs
+
+    def ref_entries(self) -> Iterator[Tuple[str, str, str]]:
+        """Generate (refname, objectname, upstream) for each of the refs, in refname order"""
+        refs = self.read_refs()
+        for refname in sorted(refs):
+            upstream = self.upstream(refname[len('refs/heads/'):]) if refname.startswith('refs/heads/') else ''
+            yield refname, refs[refname], upstream
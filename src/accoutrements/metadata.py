@@ -0,0 +1,101 @@
+import os
+from typing import Callable, List, Optional
+
+from . import find_develop_branch, find_master_branch, find_upstream_remote
+from .config import git_common_dir, has_signing_key
+from .gitdir import path_fingerprint, user_config_paths
+from .state import clear_state, load_state, save_state
+
+METADATA_STATE = 'metadata.json'
+
+# each section of the metadata is computed on demand and only depends on the files that are listed for it
+SECTIONS = ('remote', 'branches', 'signing_key')
+
+
+def _config_paths(common_dir: str) -> List[str]:
+    return [os.path.join(common_dir, 'config')]
+
+
+def _remote_ref_paths(common_dir: str) -> List[str]:
+    # adding or removing a remote branch either rewrites packed-refs or updates the modification time of its folder
+    paths = _config_paths(common_dir) + [os.path.join(common_dir, 'packed-refs')]
+    for folder, _, _ in os.walk(os.path.join(common_dir, 'refs', 'remotes')):
+        paths.append(folder)
+    return paths
+
+
+def _user_config_paths(common_dir: str) -> List[str]:
+    return user_config_paths() + _config_paths(common_dir)
+
+
+class RepositoryMetadata:
+    """The remote, branch names and signing key of a repository, persisted in the .git folder between commands"""
+
+    def __init__(self, cwd: Optional[str] = None):
+        self._cwd = cwd
+        self._common_dir = git_common_dir(cwd)
+        self._state = load_state(METADATA_STATE, cwd=cwd)
+
+    def is_fresh(self, name: str) -> bool:
+        entry = self._state.get(name)
+        return isinstance(entry, dict) and path_fingerprint(entry.get('paths', [])) == entry.get('fingerprint')
+
+    def values(self, name: str) -> Optional[dict]:
+        """The stored values of a section (without checking that they are still valid), used for inspection"""
+        entry = self._state.get(name)
+        return entry.get('values') if isinstance(entry, dict) else None
+
+    def _section(self, name: str, watched: Callable[[str], List[str]], compute: Callable[[], dict]) -> dict:
+        if self.is_fresh(name):
+            return self._state[name]['values']
+
+        # the fingerprint is taken before computing, so a change part way through is picked up by the next command
+        paths = watched(self._common_dir)
+        fingerprint = path_fingerprint(paths)
+        values = compute()
+
+        self._state[name] = {'paths': paths, 'fingerprint': fingerprint, 'values': values}
+        try:
+            save_state(METADATA_STATE, self._state, cwd=self._cwd)
+        except OSError:
+            pass  # i.e. a read only repository, the values are just not remembered
+        return values
+
+    def _compute_remote(self) -> dict:
+        return {'remote': find_upstream_remote(self._cwd)}
+
+    def _compute_branches(self) -> dict:
+        remote = self.remote
+        if remote is None:
+            return {'master': None, 'develop': None}
+        return {
+            'master': find_master_branch(remote, cwd=self._cwd),
+            'develop': find_develop_branch(remote, cwd=self._cwd),
+        }
+
+    def _compute_signing_key(self) -> dict:
+        return {'signing_key': has_signing_key(cwd=self._cwd)}
+
+    @property
+    def remote(self) -> Optional[str]:
+        return self._section('remote', _config_paths, self._compute_remote)['remote']
+
+    @property
+    def master(self) -> Optional[str]:
+        return self._section('branches', _remote_ref_paths, self._compute_branches)['master']
+
+    @property
+    def develop(self) -> Optional[str]:
+        return self._section('branches', _remote_ref_paths, self._compute_branches)['develop']
+
+    @property
+    def signing_key(self) -> bool:
+        return self._section('signing_key', _user_config_paths, self._compute_signing_key)['signing_key']
+
+
+def load_metadata(cwd: Optional[str] = None) -> RepositoryMetadata:
+    return RepositoryMetadata(cwd)
+
+
+def clear_metadata(cwd: Optional[str] = None) -> bool:
+    return clear_state(METADATA_STATE, cwd=cwd)
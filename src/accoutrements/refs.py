@@ -0,0 +1,236 @@
+import functools
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from . import runner
+from .config import GitConfigFile, GitConfigError, git_common_dir
+from .gitdir import GitDirectory, UnsupportedLayout
+
+REF_FORMAT = '%(refname)%00%(objectname)%00%(upstream)'
+TRACK_FORMAT = '%(refname)%00%(upstream:track)'
+LOCAL_PREFIX = 'refs/heads/'
+REMOTE_PREFIX = 'refs/remotes/'
+
+
+class RefSnapshot:
+    """A point in time view of all the refs in a repository, indexed by remote and by name"""
+
+    def __init__(self, remotes: Iterable[str], refs: Iterable[Tuple[str, str, str]]):
+        self._remotes = set(remotes)
+        self._refs: Dict[str, str] = {}
+        self._upstreams: Dict[str, str] = {}
+        self._remote_branches: Dict[str, Set[str]] = {remote: set() for remote in self._remotes}
+
+        # match the longest remote names first so that remotes like `foo/bar` take priority over `foo`
+        ordered_remotes = sorted(self._remotes, key=len, reverse=True)
+
+        for refname, objectname, upstream in refs:
+            self._refs[refname] = objectname
+
+            if refname.startswith(LOCAL_PREFIX):
+                self._upstreams[refname[len(LOCAL_PREFIX):]] = upstream
+
+            elif refname.startswith(REMOTE_PREFIX):
+                remote, branch = _split_remote_ref(ordered_remotes, refname[len(REMOTE_PREFIX):])
+                if remote is not None and branch != 'HEAD':
+                    self._remote_branches[remote].add(branch)
+
+    @property
+    def remotes(self) -> Set[str]:
+        return set(self._remotes)
+
+    @property
+    def local_branches(self) -> Set[str]:
+        return set(self._upstreams.keys())
+
+    def remote_branches(self, remote: str) -> Set[str]:
+        return set(self._remote_branches.get(remote, set()))
+
+    def has_ref(self, refname: str) -> bool:
+        return refname in self._refs
+
+    def resolve(self, refname: str) -> Optional[str]:
+        return self._refs.get(refname)
+
+    def upstream(self, branch: str) -> Optional[str]:
+        return self._upstreams.get(branch) or None
+
+
+def _split_remote_ref(remotes: List[str], name: str) -> Tuple[Optional[str], str]:
+    for remote in remotes:
+        if name.startswith(remote + '/'):
+            return remote, name[len(remote) + 1:]
+    return None, name
+
+
+def _parse_ref_line(line: str) -> Tuple[str, str, str]:
+    refname, objectname, upstream = line.split('\0')
+    return refname, objectname, upstream
+
+
+@functools.lru_cache(maxsize=None)
+def load_ref_snapshot(cwd: Optional[str] = None) -> RefSnapshot:
+    # the refs are read directly from the .git folder where possible, avoiding the cost of starting git
+    try:
+        git_dir = GitDirectory.open(cwd)
+        return RefSnapshot(git_dir.remotes(), git_dir.ref_entries())
+    except UnsupportedLayout:
+        pass
+
+    remotes = runner.check_output(['git', 'remote'], cwd=cwd).decode().split()
+
+    cmd = ['git', 'for-each-ref', f'--format={REF_FORMAT}']
+    output = runner.check_output(cmd, cwd=cwd).decode()
+
+    return RefSnapshot(remotes, map(_parse_ref_line, output.splitlines()))
+
+
+def iter_stale_branches(cwd: Optional[str] = None) -> Iterator[str]:
+    """Lazily generate the local branches whose upstream has been removed, streaming the output of git"""
+    try:
+        git_dir = GitDirectory.open(cwd)
+    except UnsupportedLayout:
+        git_dir = None
+
+    if git_dir is not None:
+        # only the local branches are listed, each upstream is looked up on its own
+        for branch in git_dir.iter_branches():
+            upstream = git_dir.upstream(branch)
+            if upstream != '' and not git_dir.has_ref(upstream):
+                yield branch
+        return
+
+    cmd = ['git', 'for-each-ref', f'--format={TRACK_FORMAT}', LOCAL_PREFIX]
+    with runner.stream(cmd, cwd=cwd) as lines:
+        for line in lines:
+            refname, _, track = line.rstrip(b'\n').decode(errors='surrogateescape').partition('\0')
+            if track == '[gone]':
+                yield refname[len(LOCAL_PREFIX):]
+
+
+def current_branch(cwd: Optional[str] = None) -> Optional[str]:
+    """The name of the branch that is checked out, or None when the HEAD is detached"""
+    try:
+        return GitDirectory.open(cwd).head()
+    except UnsupportedLayout:
+        pass
+
+    output = runner.check_output(['git', 'branch', '--show-current'], cwd=cwd).decode().strip()
+    return output or None
+
+
+def remote_head(remote: str, cwd: Optional[str] = None) -> Optional[str]:
+    """The default branch of the remote as recorded locally by `git clone` or `git remote set-head`"""
+    refname = f'{REMOTE_PREFIX}{remote}/HEAD'
+    try:
+        target = GitDirectory.open(cwd).symref(refname)
+    except UnsupportedLayout:
+        process = runner.run(['git', 'symbolic-ref', '-q', refname], stdout=runner.PIPE, stderr=runner.DEVNULL, cwd=cwd)
+        target = process.stdout.decode().strip()
+
+    prefix = f'{REMOTE_PREFIX}{remote}/'
+    return target[len(prefix):] if target and target.startswith(prefix) else None
+
+
+def query_remote_head(remote: str, cwd: Optional[str] = None) -> Optional[str]:
+    """Ask the server for the default branch of the remote, without listing all of its refs"""
+    cmd = ['git', 'ls-remote', '--symref', remote, 'HEAD']
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    process = runner.run(cmd, stdout=runner.PIPE, stderr=runner.DEVNULL, env=env, cwd=cwd)
+    if process.returncode != 0:
+        return None
+
+    # i.e. `ref: refs/heads/main<TAB>HEAD`
+    for line in process.stdout.decode().splitlines():
+        target, _, name = line.partition('\t')
+        if target.startswith('ref: ' + LOCAL_PREFIX) and name == 'HEAD':
+            return target[len('ref: ' + LOCAL_PREFIX):]
+    return None
+
+
+def invalidate_ref_snapshot():
+    """Drop all the memoized snapshots, must be called after any operation that changes the refs (i.e. fetch)"""
+    load_ref_snapshot.cache_clear()
+
+
+def _update_refs(commands: List[str], message: Optional[str] = None, cwd: Optional[str] = None) -> Optional[str]:
+    """Apply the update-ref commands as a single transaction, returning the error message on failure"""
+    cmd = ['git', 'update-ref', '--stdin'] + (['-m', message] if message is not None else [])
+    stdin = ''.join(f'{command}\n' for command in commands).encode()
+    process = runner.run(cmd, input=stdin, stdout=runner.PIPE, stderr=runner.PIPE, cwd=cwd)
+    if process.returncode == 0:
+        return None
+    errors = process.stderr.decode().strip().splitlines()
+    return errors[0] if len(errors) > 0 else f'git update-ref exited with {process.returncode}'
+
+
+def _delete_refs(deletions: List[Tuple[str, str]], results: Dict[str, Optional[str]], cwd: Optional[str] = None):
+    error = _update_refs([f'delete {LOCAL_PREFIX}{branch} {objectname}' for branch, objectname in deletions], cwd=cwd)
+    if error is None:
+        results.update({branch: None for branch, _ in deletions})
+    elif len(deletions) == 1:
+        results[deletions[0][0]] = error
+    else:
+        # a single bad ref aborts the whole transaction, split the batch to isolate it from the others
+        middle = len(deletions) // 2
+        _delete_refs(deletions[:middle], results, cwd=cwd)
+        _delete_refs(deletions[middle:], results, cwd=cwd)
+
+
+def move_local_branches(moves: Iterable[Tuple[str, Optional[str], str]], message: str,
+                        cwd: Optional[str] = None) -> Optional[str]:
+    """
+    Move each (branch, old objectname, new objectname) in a single ref transaction, where an old objectname of None
+    creates the branch. Nothing is changed when any of the branches has moved in the meantime
+    """
+    commands = []
+    for branch, old, new in moves:
+        if old is None:
+            commands.append(f'create {LOCAL_PREFIX}{branch} {new}')
+        else:
+            commands.append(f'update {LOCAL_PREFIX}{branch} {new} {old}')
+
+    if len(commands) == 0:
+        return None
+
+    error = _update_refs(commands, message=message, cwd=cwd)
+    invalidate_ref_snapshot()
+    return error
+
+
+def delete_local_branches(branches: Iterable[str], cwd: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """Delete the local branches in a single ref transaction, returning the error (if any) for each branch"""
+    from .worktrees import checked_out_branches
+
+    snapshot = load_ref_snapshot(cwd)
+    branches = sorted(set(branches))
+
+    # like `git branch -D`, a branch that is checked out in any of the worktrees is never deleted
+    checked_out = checked_out_branches(cwd) if len(branches) > 0 else {}
+
+    results: Dict[str, Optional[str]] = {}
+    deletions = []
+    for branch in branches:
+        objectname = snapshot.resolve(LOCAL_PREFIX + branch)
+        if objectname is None:
+            results[branch] = 'branch not found'
+        elif branch in checked_out:
+            results[branch] = f'checked out at {checked_out[branch]}'
+        else:
+            deletions.append((branch, objectname))
+
+    if len(deletions) > 0:
+        _delete_refs(deletions, results, cwd=cwd)
+        invalidate_ref_snapshot()
+
+    # like `git branch -D` also remove the tracking configuration of the deleted branches
+    deleted = [branch for branch, error in results.items() if error is None]
+    if len(deleted) > 0:
+        try:
+            config = GitConfigFile.load(os.path.join(git_common_dir(cwd), 'config'))
+            if config.remove_sections(('branch', branch) for branch in deleted) > 0:
+                config.save()
+        except GitConfigError as ex:
+            print(f'Unable to remove the configuration of the deleted branches: {ex}')
+
+    return results
@@ -0,0 +1,61 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from . import runner
+
+# the branch prefixes created by `git feature`, `git bugfix` and `git chore`, in the order they are listed
+NOTE_GROUPS = (
+    ('feature', 'Features'),
+    ('bugfix', 'Bug fixes'),
+    ('chore', 'Chores'),
+)
+OTHER_GROUP = 'Other changes'
+
+# i.e. `Merge pull request #12 from user/feature/foo` or `Merge branch 'feature/foo' into develop`
+_BRANCH_PATTERN = re.compile(r"(?:^|[\s'/])(" + '|'.join(prefix for prefix, _ in NOTE_GROUPS) + r")/([^\s']+)")
+_PULL_REQUEST_PATTERN = re.compile(r'^Merge pull request (#\d+)')
+
+
+def parse_merge_subject(subject: str) -> Tuple[Optional[str], str]:
+    """Split the subject of a merge commit into the branch prefix (if any) and the text of its release note"""
+    match = _BRANCH_PATTERN.search(subject)
+    if match is None:
+        return None, subject
+
+    prefix, name = match.groups()
+    pull_request = _PULL_REQUEST_PATTERN.match(subject)
+    return prefix, f'{name} ({pull_request.group(1)})' if pull_request is not None else name
+
+
+class ReleaseNotes:
+    def __init__(self):
+        self._groups: Dict[Optional[str], List[str]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(notes) for notes in self._groups.values())
+
+    def add(self, subject: str):
+        prefix, note = parse_merge_subject(subject)
+        self._groups.setdefault(prefix, []).append(note)
+
+    def format(self) -> str:
+        # plain text rather than markdown, git would strip `#` headings from a tag message
+        sections = []
+        for prefix, title in NOTE_GROUPS + ((None, OTHER_GROUP),):
+            notes = self._groups.get(prefix)
+            if notes:
+                sections.append('\n'.join([f'{title}:'] + [f'- {note}' for note in notes]))
+        return '\n\n'.join(sections)
+
+
+def generate_release_notes(previous: Optional[str], cwd: Optional[str] = None) -> ReleaseNotes:
+    """Collect the merges into the current branch since the previous release, from a single pass over the history"""
+    revisions = [f'{previous}..HEAD'] if previous is not None else ['HEAD']
+    cmd = ['git', 'log', '--first-parent', '--merges', '--format=%s'] + revisions + ['--']
+
+    # the history is streamed, only the (comparatively few) merge subjects are kept
+    notes = ReleaseNotes()
+    with runner.stream(cmd, cwd=cwd) as lines:
+        for line in lines:
+            notes.add(line.rstrip(b'\n').decode(errors='replace'))
+    return notes
@@ -0,0 +1,193 @@
+import atexit
+import contextlib
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Iterator, List, Optional, Dict
+
+# re-exported so that callers do not need to import subprocess themselves
+CalledProcessError = subprocess.CalledProcessError
+DEVNULL = subprocess.DEVNULL
+PIPE = subprocess.PIPE
+STDOUT = subprocess.STDOUT
+
+TRACE_ENV = 'ACCOUTREMENTS_TRACE'
+DEFAULT_TRACE_FILENAME = 'accoutrements-trace.ndjson'
+
+# git options that take a separate value and come before the subcommand
+_GIT_VALUE_OPTIONS = ('-c', '-C', '--git-dir', '--work-tree', '--namespace', '--exec-path')
+
+
+def trace_path_from_env() -> Optional[str]:
+    value = os.environ.get(TRACE_ENV, '').strip()
+    if value.lower() in ('', '0', 'false', 'no', 'off'):
+        return None
+    if value.lower() in ('1', 'true', 'yes', 'on'):
+        return os.path.abspath(DEFAULT_TRACE_FILENAME)
+    return value
+
+
+def enable_tracing(path: Optional[str] = None):
+    """Enable tracing for this process and any accoutrements commands that it starts"""
+    os.environ[TRACE_ENV] = os.path.abspath(path or DEFAULT_TRACE_FILENAME)
+    _Tracer.reset()
+
+
+def subcommand(cmd: List[str]) -> str:
+    if len(cmd) == 0:
+        return ''
+    if os.path.basename(cmd[0]) != 'git':
+        return os.path.basename(cmd[0])
+
+    index = 1
+    while index < len(cmd) and cmd[index].startswith('-'):
+        index += 2 if cmd[index] in _GIT_VALUE_OPTIONS else 1
+    return cmd[index] if index < len(cmd) else 'git'
+
+
+class _Tracer:
+    _instance = None
+    _instance_lock = threading.Lock()
+    _registered = False
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._summary: Dict[str, List[float]] = {}
+
+    @classmethod
+    def get(cls) -> Optional['_Tracer']:
+        path = trace_path_from_env()
+        if path is None:
+            return None
+
+        with cls._instance_lock:
+            if cls._instance is None or cls._instance._path != path:
+                cls._instance = cls(path)
+
+            # only the summary of the current tracer is printed, however many times tracing is (re)enabled
+            if not cls._registered:
+                atexit.register(cls.print_at_exit)
+                cls._registered = True
+            return cls._instance
+
+    @classmethod
+    def print_at_exit(cls):
+        if cls._instance is not None:
+            cls._instance.print_summary()
+
+    @classmethod
+    def reset(cls):
+        with cls._instance_lock:
+            cls._instance = None
+
+    def record(self, cmd: List[str], cwd: Optional[str], started: float, duration: float, returncode: Optional[int],
+               output_bytes: Optional[int]):
+        import json
+
+        entry = {
+            'argv': list(cmd),
+            'cwd': os.path.abspath(cwd or os.getcwd()),
+            'pid': os.getpid(),
+            'start': started,
+            'duration': duration,
+            'returncode': returncode,
+            'output_bytes': output_bytes,
+        }
+
+        with self._lock:
+            stats = self._summary.setdefault(subcommand(cmd), [0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+
+            with open(self._path, 'a') as trace_file:
+                trace_file.write(json.dumps(entry) + '\n')
+
+    def print_summary(self):
+        if len(self._summary) == 0:
+            return
+
+        total_calls = sum(int(stats[0]) for stats in self._summary.values())
+        total_time = sum(stats[1] for stats in self._summary.values())
+
+        width = max(16, max(len(name) for name in self._summary))
+
+        print(file=sys.stderr)
+        print(f'Trace summary ({total_calls} calls, {total_time:.3f}s, written to {self._path})', file=sys.stderr)
+        for name, (calls, duration) in sorted(self._summary.items(), key=lambda item: -item[1][1]):
+            print(f'  {name:<{width}} {int(calls):5d} calls {duration:9.3f}s', file=sys.stderr)
+
+
+@contextlib.contextmanager
+def traced(cmd: List[str], cwd: Optional[str]):
+    """Record the command in the trace (when enabled), the yielded record is updated with `record_result`"""
+    tracer = _Tracer.get()
+    if tracer is None:
+        yield None
+        return
+
+    record = {'returncode': None, 'output_bytes': None}
+    started_wall, started = time.time(), time.perf_counter()
+    try:
+        yield record
+    finally:
+        tracer.record(cmd, cwd, started_wall, time.perf_counter() - started, record['returncode'],
+                      record['output_bytes'])
+
+
+def record_result(record: Optional[dict], returncode: Optional[int], *outputs: Optional[bytes]):
+    if record is not None:
+        record['returncode'] = returncode
+        if any(output is not None for output in outputs):
+            record['output_bytes'] = sum(len(output) for output in outputs if output is not None)
+
+
+def run(cmd: List[str], cwd: Optional[str] = None, check: bool = False, **kwargs) -> subprocess.CompletedProcess:
+    with traced(cmd, cwd) as record:
+        try:
+            process = subprocess.run(cmd, cwd=cwd, check=check, **kwargs)
+        except subprocess.CalledProcessError as ex:
+            record_result(record, ex.returncode, ex.output, ex.stderr)
+            raise
+        record_result(record, process.returncode, process.stdout, process.stderr)
+        return process
+
+
+def check_output(cmd: List[str], cwd: Optional[str] = None, **kwargs) -> bytes:
+    return run(cmd, cwd=cwd, check=True, stdout=PIPE, **kwargs).stdout
+
+
+def check_call(cmd: List[str], cwd: Optional[str] = None, **kwargs):
+    run(cmd, cwd=cwd, check=True, **kwargs)
+
+
+def call(cmd: List[str], cwd: Optional[str] = None, **kwargs) -> int:
+    return run(cmd, cwd=cwd, **kwargs).returncode
+
+
+@contextlib.contextmanager
+def stream(cmd: List[str], cwd: Optional[str] = None) -> Iterator[Iterator[bytes]]:
+    """Run the command, providing the lines of its output as they are produced"""
+    with traced(cmd, cwd) as record:
+        output_bytes = 0
+
+        def lines(stdout) -> Iterator[bytes]:
+            nonlocal output_bytes
+            for line in stdout:
+                output_bytes += len(line)
+                yield line
+
+        with subprocess.Popen(cmd, cwd=cwd, stdout=PIPE) as process:
+            try:
+                yield lines(process.stdout)
+            finally:
+                process.stdout.close()
+                process.wait()
+                record_result(record, process.returncode)
+                if record is not None:
+                    record['output_bytes'] = output_bytes
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+from .discovery import ScanFunction, ScanResult, ScanRules, ScanStats, Scanner, DEFAULT_SCAN_JOBS, discover_repositories
+
+INDEX_VERSION = 1
+INDEX_FILENAME = 'ditto-index.json'
+
+# Folders modified this close to the start of the scan might be modified again within the same timestamp granularity
+# (the "racy git" problem), such entries are never trusted on the next scan
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+def default_index_path() -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'git-accoutrements', INDEX_FILENAME)
+
+
+def scan_key(path: str, **options) -> str:
+    parts = [os.path.abspath(path)] + [f'{name}={options[name]}' for name in sorted(options)]
+    return '|'.join(parts)
+
+
+class ScanIndex:
+    """An on-disk record of the folders visited by a scan, so that unchanged folders need not be listed again"""
+
+    def __init__(self, path: str, key: str, entries: Dict[str, list], other_scans: Dict[str, dict]):
+        self._path = path
+        self._key = key
+        self._previous = entries
+        self._other_scans = other_scans
+        self._current: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._started_ns = time.time_ns()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: str, key: str, rebuild: bool = False) -> 'ScanIndex':
+        scans = {}
+        try:
+            with open(path, 'r') as index_file:
+                data = json.load(index_file)
+            if data.get('version') == INDEX_VERSION:
+                scans = data.get('scans', {})
+        except (OSError, ValueError):
+            pass  # a missing or corrupt index is simply rebuilt
+
+        entries = scans.pop(key, {})
+        if rebuild:
+            entries = {}
+
+        return cls(path, key, entries, scans)
+
+    def _lookup(self, path: str, stat: os.stat_result) -> Optional[ScanResult]:
+        entry = self._previous.get(path)
+        if entry is None:
+            return None
+
+        mtime_ns, ctime_ns, is_repo, children = entry
+        if mtime_ns != stat.st_mtime_ns or ctime_ns != stat.st_ctime_ns:
+            return None
+
+        return is_repo, children
+
+    def wrap(self, scan: ScanFunction) -> ScanFunction:
+        def cached_scan(path: str) -> ScanResult:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False, []
+
+            result = self._lookup(path, stat)
+            with self._lock:
+                if result is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+
+            if result is None:
+                result = scan(path)
+
+            is_repo, children = result
+            with self._lock:
+                self._current[path] = [stat.st_mtime_ns, stat.st_ctime_ns, is_repo, list(children)]
+
+            return result
+
+        return cached_scan
+
+    def save(self):
+        # only the folders visited in this scan are kept, which naturally drops folders that have been removed
+        racy_threshold = self._started_ns - RACY_WINDOW_NS
+        entries = {
+            path: entry for path, entry in self._current.items()
+            if max(entry[0], entry[1]) < racy_threshold
+        }
+
+        scans = dict(self._other_scans)
+        scans[self._key] = entries
+
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        tmp_path = f'{self._path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as index_file:
+            json.dump({'version': INDEX_VERSION, 'scans': scans}, index_file, separators=(',', ':'))
+        os.replace(tmp_path, self._path)
+
+
+def scan_repositories(path: str, deep: bool = False, jobs: int = DEFAULT_SCAN_JOBS, rebuild: bool = False,
+                      index_path: Optional[str] = None, rules: Optional[ScanRules] = None,
+                      stats: Optional[ScanStats] = None) -> Iterator[str]:
+    """Discover the repositories under the path, reusing (and updating) the on-disk scan index"""
+    rules = rules or ScanRules()
+    key = scan_key(path, deep=deep, rules=rules.key)
+    index = ScanIndex.load(index_path or default_index_path(), key, rebuild=rebuild)
+    scanner = Scanner(path, deep=deep, rules=rules, stats=stats)
+
+    yield from discover_repositories(path, jobs=jobs, scan=index.wrap(scanner))
+
+    # the index is only updated once the whole tree has been walked
+    scanner.stats.add(visited=index.hits, cached=index.hits)
+    index.save()
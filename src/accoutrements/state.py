@@ -0,0 +1,42 @@
+import os
+from typing import Optional
+
+from .config import git_common_dir
+
+STATE_FOLDER = 'accoutrements'
+
+
+def state_path(name: str, cwd: Optional[str] = None) -> str:
+    """The path of a state file that is kept inside the .git folder of the repository"""
+    return os.path.join(git_common_dir(cwd), STATE_FOLDER, name)
+
+
+def load_state(name: str, cwd: Optional[str] = None) -> dict:
+    import json
+
+    try:
+        with open(state_path(name, cwd=cwd), 'r') as state_file:
+            state = json.load(state_file)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}  # missing or corrupt state is simply rebuilt
+
+
+def save_state(name: str, state: dict, cwd: Optional[str] = None):
+    import json
+
+    path = state_path(name, cwd=cwd)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as state_file:
+        json.dump(state, state_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def clear_state(name: str, cwd: Optional[str] = None) -> bool:
+    try:
+        os.unlink(state_path(name, cwd=cwd))
+        return True
+    except FileNotFoundError:
+        return False
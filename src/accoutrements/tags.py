@@ -0,0 +1,106 @@
+import os
+from typing import List, Optional, Tuple
+
+from . import runner
+from .config import git_common_dir
+from .gitdir import path_fingerprint
+from .state import load_state, save_state
+from .versions import Version, parse_version
+
+TAGS_STATE = 'tags.json'
+TAG_FORMAT = '%(refname)%00%(objectname)%00%(*objectname)'
+TAG_PREFIX = 'refs/tags/'
+
+# (tag name, commit, parsed version)
+TagEntry = Tuple[str, str, Optional[Version]]
+
+
+def tags_fingerprint(cwd: Optional[str] = None) -> str:
+    """A cheap fingerprint of the tag storage, which changes whenever a tag is created, moved or deleted"""
+    common_dir = git_common_dir(cwd)
+
+    paths = [os.path.join(common_dir, 'packed-refs'), os.path.join(common_dir, 'reftable', 'tables.list')]
+    for folder, _, _ in os.walk(os.path.join(common_dir, 'refs', 'tags')):
+        paths.append(folder)  # adding, removing or replacing a loose tag always updates its folder
+
+    return path_fingerprint(paths)
+
+
+class TagIndex:
+    def __init__(self, tags: List[TagEntry]):
+        self._tags = tags
+        self._versions = sorted((version, name) for name, _, version in tags if version is not None)
+
+    @property
+    def tags(self) -> List[TagEntry]:
+        return self._tags
+
+    @property
+    def versions(self) -> List[Tuple[Version, str]]:
+        """The version tags in release order"""
+        return self._versions
+
+    def highest(self) -> Optional[str]:
+        return self._versions[-1][1] if len(self._versions) > 0 else None
+
+    def to_state(self) -> list:
+        return [[name, commit, list(version) if version is not None else None] for name, commit, version in self._tags]
+
+    @classmethod
+    def from_state(cls, state: list) -> 'TagIndex':
+        return cls([
+            (name, commit, Version(*version) if version is not None else None) for name, commit, version in state
+        ])
+
+
+def _read_tags(cwd: Optional[str] = None) -> List[TagEntry]:
+    cmd = ['git', 'for-each-ref', f'--format={TAG_FORMAT}', TAG_PREFIX]
+    output = runner.check_output(cmd, cwd=cwd).decode()
+
+    tags = []
+    for line in output.splitlines():
+        refname, objectname, peeled = line.split('\0')
+        name = refname[len(TAG_PREFIX):]
+        tags.append((name, peeled or objectname, parse_version(name)))
+    return tags
+
+
+def load_tag_index(cwd: Optional[str] = None) -> TagIndex:
+    """Load the tags of the repository, only reading them from git when they have changed since the last run"""
+    fingerprint = tags_fingerprint(cwd)
+
+    state = load_state(TAGS_STATE, cwd=cwd)
+    if state.get('fingerprint') == fingerprint:
+        try:
+            return TagIndex.from_state(state['tags'])
+        except (KeyError, TypeError, ValueError):
+            pass  # a corrupt index is simply rebuilt
+
+    index = TagIndex(_read_tags(cwd=cwd))
+    try:
+        save_state(TAGS_STATE, {'fingerprint': fingerprint, 'tags': index.to_state()}, cwd=cwd)
+    except OSError:
+        pass  # the index is only an optimisation
+    return index
+
+
+def current_version(cwd: Optional[str] = None) -> str:
+    # the highest release tag is used, rather than the nearest one, so that releasing from a maintenance branch does
+    # not go backwards
+    highest = load_tag_index(cwd=cwd).highest()
+    if highest is not None:
+        return highest
+
+    cmd = ['git', 'describe', '--always']
+    output = runner.check_output(cmd, cwd=cwd).decode().strip()
+    return output
+
+
+def previous_release(cwd: Optional[str] = None) -> Optional[str]:
+    """The highest version tag that is reachable from HEAD, i.e. the release that the next one follows on from"""
+    # the highest release is usually an ancestor, so only a maintenance branch needs more than one check
+    for _, name in reversed(load_tag_index(cwd=cwd).versions):
+        cmd = ['git', 'merge-base', '--is-ancestor', f'{TAG_PREFIX}{name}', 'HEAD']
+        if runner.call(cmd, cwd=cwd, stderr=runner.DEVNULL) == 0:
+            return name
+    return None
@@ -1,8 +1,9 @@
 import re
-from typing import Optional
+from typing import Optional, NamedTuple
 
 VERSION_MATCHER = re.compile(r'^v(\d+)\.(\d+)\.(\d+)-?((alpha|beta|rc)(\d+))?(-\d+-g[a-f0-9]{7,9}(-(wip|dirty))?)?$')
 VALID_MODES = ('iota', 'pre', 'patch', 'minor', 'major', 'minor-iota', 'minor-rc', 'release')
+PRE_RELEASES = ('alpha', 'beta', 'rc', 'rel')  # in release order
 
 
 class VersionMatchError(RuntimeError):
@@ -15,6 +16,36 @@ class VersionMatchError(RuntimeError):
         return self._version
 
 
+class Version(NamedTuple):
+    """A parsed release version, which sorts pre-releases before the release that they lead up to"""
+    major: int
+    minor: int
+    patch: int
+    stage: int = PRE_RELEASES.index('rel')
+    stage_version: int = 0
+
+    @property
+    def pre(self) -> str:
+        return PRE_RELEASES[self.stage]
+
+    def __str__(self) -> str:
+        text = 'v{}.{}.{}'.format(self.major, self.minor, self.patch)
+        if self.pre != 'rel':
+            text += '-{}{}'.format(self.pre, self.stage_version)
+        return text
+
+
+def parse_version(text: str) -> Optional[Version]:
+    """Parse a release tag, ignoring anything that is not a plain version (i.e. has `git describe` suffixes)"""
+    match = VERSION_MATCHER.match(text)
+    if match is None or match.group(7) is not None:
+        return None
+
+    pre = match.group(5) or 'rel'
+    return Version(int(match.group(1)), int(match.group(2)), int(match.group(3)), PRE_RELEASES.index(pre),
+                   int(match.group(6) or 0))
+
+
 def _validate_mode(mode: str):
     if mode not in VALID_MODES:
         raise RuntimeError('Incorrect mode {}. Choose on of: {}'.format(mode, ','.join(list(VALID_MODES))))
@@ -0,0 +1,84 @@
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+from . import runner
+from .config import git_common_dir
+from .refs import current_branch
+
+SPARSE_PROFILE_SECTION = 'sparse-profile'
+
+
+class Worktree(NamedTuple):
+    path: str
+    branch: Optional[str]  # None when the HEAD is detached (or the worktree is bare)
+    locked: bool
+    main: bool
+
+
+def has_linked_worktrees(cwd: Optional[str] = None) -> bool:
+    # linked worktrees are registered in `.git/worktrees`, checking for it avoids starting git in the common case
+    return os.path.isdir(os.path.join(git_common_dir(cwd), 'worktrees'))
+
+
+def list_worktrees(cwd: Optional[str] = None) -> List[Worktree]:
+    """All the worktrees of the repository, starting with the main one"""
+    output = runner.check_output(['git', 'worktree', 'list', '--porcelain'], cwd=cwd).decode()
+
+    worktrees = []
+    for block in output.strip().split('\n\n'):
+        attributes = {}
+        for line in block.splitlines():
+            name, _, value = line.partition(' ')
+            attributes[name] = value
+
+        branch = attributes.get('branch')
+        worktrees.append(Worktree(
+            path=attributes['worktree'],
+            branch=branch[len('refs/heads/'):] if branch is not None and branch.startswith('refs/heads/') else None,
+            locked='locked' in attributes,
+            main=len(worktrees) == 0,
+        ))
+
+    return worktrees
+
+
+def checked_out_branches(cwd: Optional[str] = None) -> Dict[str, str]:
+    """The branches that are checked out in any of the worktrees, mapped to the path of that worktree"""
+    if has_linked_worktrees(cwd):
+        return {worktree.branch: worktree.path for worktree in list_worktrees(cwd) if worktree.branch is not None}
+
+    branch = current_branch(cwd)
+    return {branch: os.path.dirname(git_common_dir(cwd))} if branch is not None else {}
+
+
+def sparse_profile(name: str, cwd: Optional[str] = None) -> List[str]:
+    """The paths of a sparse checkout profile, configured with `git config --add sparse-profile.<name>.path <path>`"""
+    cmd = ['git', 'config', '--get-all', f'{SPARSE_PROFILE_SECTION}.{name}.path']
+    try:
+        return runner.check_output(cmd, cwd=cwd).decode().split('\n')[:-1]
+    except runner.CalledProcessError:
+        return []
+
+
+def add_worktree(path: str, branch: str, start_point: str, sparse_paths: Optional[List[str]] = None,
+                 cwd: Optional[str] = None):
+    """Create the branch at the start point, checked out in a new linked worktree"""
+    cmd = ['git', 'worktree', 'add', '--no-track', '-b', branch, path, start_point]
+    if not sparse_paths:
+        runner.check_call(cmd, cwd=cwd)
+        return
+
+    # only the files in the profile are ever written, rather than checking everything out and then removing most of it
+    runner.check_call(cmd[:3] + ['--no-checkout'] + cmd[3:], cwd=cwd)
+    runner.check_call(['git', 'sparse-checkout', 'set'] + sparse_paths, cwd=path)
+    runner.check_call(['git', 'checkout', '-q'], cwd=path)
+
+
+def remove_worktree(path: str, cwd: Optional[str] = None) -> Optional[str]:
+    """Remove a clean linked worktree, returning the error message on failure (i.e. it has local changes)"""
+    cmd = ['git', 'worktree', 'remove', path]
+    process = runner.run(cmd, stdout=runner.PIPE, stderr=runner.PIPE, cwd=cwd)
+    if process.returncode == 0:
+        return None
+    errors = process.stderr.decode().strip().splitlines()
+    return errors[0] if len(errors) > 0 else f'git worktree remove exited with {process.returncode}'
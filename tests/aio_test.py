@@ -0,0 +1,42 @@
+import threading
+import time
+
+import pytest
+
+from accoutrements import aio, runner
+
+
+def test_gather_mixed_tasks():
+    version, value = aio.gather(aio.git('--version'), lambda: 42)
+    assert version.returncode == 0 and version.stdout.startswith(b'git version')
+    assert value == 42
+
+
+def test_gather_overlaps_tasks():
+    started = time.monotonic()
+    aio.gather(*(aio.run(['sleep', '0.2']) for _ in range(4)))
+    assert time.monotonic() - started < 0.6
+
+
+def test_gather_jobs():
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def task():
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    aio.gather(*([task] * 8), jobs=2)
+    assert active[1] <= 2
+
+
+def test_check():
+    with pytest.raises(runner.CalledProcessError):
+        aio.gather(aio.git('not-a-real-command'))
+
+    result, = aio.gather(aio.git('not-a-real-command', check=False))
+    assert result.returncode != 0 and result.stderr != b''
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from accoutrements.config import GitConfigFile, update_repo_config, UNCHANGED, UPDATED, FAILED
+
+SAMPLE_CONFIG = """[core]
+\trepositoryformatversion = 0
+\tbare = false
+# a comment that should be preserved
+[remote "origin"]
+\turl = git@github.com:example/repo.git
+\tfetch = +refs/heads/*:refs/remotes/origin/*
+[user]
+\tname = "Old Name"  ; trailing comment
+\temail = old@example.com
+"""
+
+
+@pytest.fixture
+def repo(tmp_path, git):
+    git(str(tmp_path), 'init', '-q')
+    with open(os.path.join(str(tmp_path), '.git', 'config'), 'w') as config_file:
+        config_file.write(SAMPLE_CONFIG)
+    return str(tmp_path)
+
+
+def test_read_values(repo):
+    config = GitConfigFile.load(os.path.join(repo, '.git', 'config'))
+    assert config.get('user.name') == 'Old Name'
+    assert config.get('USER.Email') == 'old@example.com'
+    assert config.get('remote.origin.url') == 'git@github.com:example/repo.git'
+    assert config.get('core.bare') == 'false'
+    assert config.get('user.signingkey') is None
+
+
+def test_update_only_writes_changes(repo, git):
+    config_path = os.path.join(repo, '.git', 'config')
+
+    result = update_repo_config(repo, {'user.name': 'Old Name', 'user.email': 'old@example.com'})
+    assert result.status == UNCHANGED
+
+    result = update_repo_config(repo, {'user.name': 'New Name', 'user.email': 'old@example.com',
+                                       'user.signingkey': 'ABCD; #1'})
+    assert result.status == UPDATED
+    assert result.changes == {'user.name': 'New Name', 'user.signingkey': 'ABCD; #1'}
+
+    assert git(repo, 'config', '--local', 'user.name') == 'New Name'
+    assert git(repo, 'config', '--local', 'user.email') == 'old@example.com'
+    assert git(repo, 'config', '--local', 'user.signingkey') == 'ABCD; #1'
+    assert '# a comment that should be preserved' in open(config_path).read()
+    assert not os.path.exists(config_path + '.lock')
+
+
+def test_update_creates_section(repo, git):
+    result = update_repo_config(repo, {'user.name': 'Name', 'remote.upstream.url': 'file:///tmp/x'})
+    assert result.status == UPDATED
+    assert git(repo, 'config', '--local', 'remote.upstream.url') == 'file:///tmp/x'
+
+
+def test_update_locked(repo):
+    open(os.path.join(repo, '.git', 'config.lock'), 'w').close()
+    result = update_repo_config(repo, {'user.name': 'New Name'})
+    assert result.status == FAILED
+
+
+def test_update_worktree(repo, git):
+    git(repo, 'commit', '-q', '--allow-empty', '-m', 'initial')
+    git(repo, 'worktree', 'add', '-q', '-b', 'linked', f'{repo}-linked')
+
+    # the config of a linked worktree is the config of the repository
+    assert update_repo_config(f'{repo}-linked', {'user.name': 'Linked'}).status == UPDATED
+    assert git(repo, 'config', '--local', 'user.name') == 'Linked'
+
+
+def test_update_not_a_repo(tmp_path):
+    assert update_repo_config(str(tmp_path), {'user.name': 'Name'}).status == FAILED
+
+
+def test_remove_sections(repo, git):
+    config_path = os.path.join(repo, '.git', 'config')
+    config = GitConfigFile.load(config_path)
+    assert config.remove_sections([('remote', 'origin'), ('branch', 'missing')]) == 1
+    config.save()
+
+    assert GitConfigFile.load(config_path).sections() == [('core', None), ('user', None)]
+    assert git(repo, 'config', '--local', 'user.email') == 'old@example.com'
@@ -0,0 +1,41 @@
+import subprocess
+
+import pytest
+
+from accoutrements.refs import invalidate_ref_snapshot
+
+
+def _run_git(cwd, *args) -> str:
+    return subprocess.check_output(['git'] + list(args), cwd=cwd, stderr=subprocess.DEVNULL).decode().strip()
+
+
+@pytest.fixture
+def git(monkeypatch):
+    """Run git in a folder and return its output, with a test identity for any commits or tags that are made"""
+    for name in ('GIT_AUTHOR_NAME', 'GIT_COMMITTER_NAME'):
+        monkeypatch.setenv(name, 'test')
+    for name in ('GIT_AUTHOR_EMAIL', 'GIT_COMMITTER_EMAIL'):
+        monkeypatch.setenv(name, 'test@example.com')
+    return _run_git
+
+
+@pytest.fixture
+def remote(tmp_path) -> str:
+    remote = str(tmp_path / 'remote.git')
+    subprocess.check_call(['git', 'init', '-q', '--bare', remote])
+    return remote
+
+
+@pytest.fixture
+def clone(tmp_path, remote, git) -> str:
+    """A clone of the bare `remote`, with an initial commit on `main` that has been pushed"""
+    clone = str(tmp_path / 'clone')
+    subprocess.check_call(['git', 'clone', '-q', remote, clone], stderr=subprocess.DEVNULL)
+
+    git(clone, 'commit', '-q', '--allow-empty', '-m', 'initial')
+    git(clone, 'branch', '-M', 'main')
+    git(clone, 'push', '-q', '-u', 'origin', 'main')
+
+    # the snapshots memoized by earlier tests may be for a repository at the same path
+    invalidate_ref_snapshot()
+    return clone
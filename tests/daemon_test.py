@@ -0,0 +1,86 @@
+import os
+import threading
+
+import pytest
+
+from accoutrements import daemon as daemon_module
+from accoutrements.daemon import RepositoryState, StateCache, compute_state, query_daemon, repository_state, serve, SOCKET_ENV
+
+
+@pytest.fixture
+def clone(clone, git):
+    git(clone, 'tag', 'v1.0.0')
+    return clone
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    path = str(tmp_path / 'daemon.sock')
+    monkeypatch.setenv(SOCKET_ENV, path)
+
+    thread = threading.Thread(target=serve, args=(path,))
+    thread.start()
+    while not os.path.exists(path):
+        thread.join(0.01)
+
+    yield path
+
+    query_daemon({'command': 'stop'})
+    thread.join()
+
+
+def test_compute_state(clone):
+    state = compute_state(clone)
+    assert (state.remote, state.master, state.develop, state.current_branch) == ('origin', 'main', None, 'main')
+    assert (state.stale_branches, state.current_version) == ([], 'v1.0.0')
+
+    state = compute_state(clone, fields=('current_version',))
+    assert (state.remote, state.current_version) == (None, 'v1.0.0')
+
+
+def test_daemon(clone, daemon, git):
+    assert repository_state(clone) == compute_state(clone)
+    assert repository_state(os.path.join(clone, '.git', '..')) == compute_state(clone)
+    assert query_daemon({'command': 'status'})['hits'] == 1
+
+    # changes to the repository are picked up on the next request
+    git(clone, 'tag', 'v1.1.0')
+    git(clone, 'checkout', '-q', '-b', 'feature/x')
+    state = repository_state(clone)
+    assert (state.current_version, state.current_branch) == ('v1.1.0', 'feature/x')
+
+    status = query_daemon({'command': 'status'})
+    assert (status['repositories'], status['hits'], status['misses']) == (1, 1, 2)
+
+
+def test_slow_repository(clone, remote, git, tmp_path, monkeypatch):
+    other = str(tmp_path / 'other')
+    git(str(tmp_path), 'clone', '-q', remote, other)
+
+    # the state of the clone takes as long as the test needs, i.e. waiting on a slow remote
+    started, release = threading.Event(), threading.Event()
+
+    def compute_state(cwd, fields=None):
+        if cwd == clone:
+            started.set()
+            release.wait(10)
+        return RepositoryState(None, None, None, None, [], None)
+
+    monkeypatch.setattr(daemon_module, 'compute_state', compute_state)
+    cache = StateCache()
+    thread = threading.Thread(target=cache.get, args=(clone,))
+    thread.start()
+    started.wait(10)
+
+    # other repositories are still answered in the meantime
+    cache.get(other)
+    assert thread.is_alive()
+
+    release.set()
+    thread.join()
+    assert (len(cache), cache.misses) == (2, 2)
+
+
+def test_no_daemon(clone, tmp_path, monkeypatch):
+    monkeypatch.setenv(SOCKET_ENV, str(tmp_path / 'missing.sock'))
+    assert repository_state(clone) == compute_state(clone)
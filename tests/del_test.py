@@ -0,0 +1,85 @@
+import importlib
+import re
+import sys
+
+import pytest
+
+from accoutrements.refs import invalidate_ref_snapshot
+
+# `del` is a keyword, so the command can not be imported with an import statement
+delete = importlib.import_module('accoutrements.cmd.del')
+
+
+@pytest.fixture
+def clone(clone, git, tmp_path, monkeypatch):
+    # a second remote, on which one of the branches has already been deleted
+    backup = str(tmp_path / 'backup.git')
+    git(str(tmp_path), 'init', '-q', '--bare', backup)
+    git(clone, 'remote', 'add', 'backup', backup)
+
+    for branch in ('feature/a', 'feature/b'):
+        git(clone, 'branch', branch)
+    for name in ('origin', 'backup'):
+        git(clone, 'push', '-q', name, 'main', 'feature/a', 'feature/b')
+    git(backup, 'branch', '-D', 'feature/b')
+
+    monkeypatch.chdir(clone)
+    invalidate_ref_snapshot()
+    return clone
+
+
+def _summary(output, name):
+    lines = re.sub(r'\x1b\[[0-9;]*m', '', output).splitlines()
+    return [line[len(name) + 2:] for line in lines if line.startswith(f'{name}: ')]
+
+
+def _remote_branches(git, path):
+    return git(path, 'for-each-ref', '--format=%(refname:short)', 'refs/heads/').splitlines()
+
+
+def test_delete(clone, remote, git, tmp_path, monkeypatch, capsys):
+    backup = str(tmp_path / 'backup.git')
+    refs = ['feature/a'] + [f'{name}/feature/{branch}' for name in ('origin', 'backup') for branch in 'ab']
+    monkeypatch.setattr(sys, 'argv', ['git-del', '--yes'] + refs)
+
+    delete.main()
+
+    output = capsys.readouterr().out
+    assert '- feature/b (already deleted)' in output  # found missing by the ls-remote check
+    assert _summary(output, 'local') == ['1 deleted, 0 failed']
+    assert _summary(output, 'origin') == ['2 deleted, 0 skipped, 0 failed']
+    assert _summary(output, 'backup') == ['1 deleted, 1 skipped, 0 failed']
+
+    assert git(clone, 'branch', '--list', 'feature/*') == 'feature/b'
+    assert _remote_branches(git, remote) == ['main']
+    assert _remote_branches(git, backup) == ['main']
+
+
+def test_push_failures(clone, git, tmp_path, monkeypatch, capsys):
+    git(str(tmp_path / 'backup.git'), 'config', 'receive.denyDeletes', 'true')
+    monkeypatch.setattr(sys, 'argv', ['git-del', '--yes', 'origin/feature/a', 'backup/feature/a', 'backup/feature/b'])
+
+    with pytest.raises(SystemExit) as ex:
+        delete.main()
+
+    # the rejection is read from the porcelain status of the ref
+    assert ex.value.code == 1
+    output = capsys.readouterr().out
+    assert _summary(output, 'origin') == ['1 deleted, 0 skipped, 0 failed']
+    assert _summary(output, 'backup') == ['0 deleted, 1 skipped, 1 failed']
+    assert '- feature/a: [remote rejected] (deletion prohibited)' in output
+
+
+def test_checked_out_branch_is_kept(clone, git, monkeypatch, capsys):
+    git(clone, 'checkout', '-q', 'feature/a')
+    monkeypatch.setattr(sys, 'argv', ['git-del', '--yes', 'feature/a', 'feature/b'])
+
+    with pytest.raises(SystemExit) as ex:
+        delete.main()
+
+    assert ex.value.code == 1
+    output = capsys.readouterr().out
+    assert _summary(output, 'local') == ['1 deleted, 1 failed']
+    assert f'feature/a: checked out at {clone}' in output
+    assert git(clone, 'branch', '--show-current') == 'feature/a'
+    assert git(clone, 'branch', '--list', 'feature/*') == '* feature/a'
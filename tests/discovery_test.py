@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from accoutrements.discovery import discover_repositories, Scanner, ScanRules, ScanStats
+
+
+def _make_repo(path, git_modules=False):
+    os.makedirs(os.path.join(path, '.git'))
+    if git_modules:
+        open(os.path.join(path, '.gitmodules'), 'w').close()
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = str(tmp_path)
+    _make_repo(os.path.join(root, 'a'))
+    _make_repo(os.path.join(root, 'a', 'nested'))
+    _make_repo(os.path.join(root, 'b'), git_modules=True)
+    _make_repo(os.path.join(root, 'b', 'module'))
+    _make_repo(os.path.join(root, 'c', 'd', 'e'))
+    _make_repo(os.path.join(root, 'node_modules', 'ignored'))
+    _make_repo(os.path.join(root, '.hidden', 'ignored'))
+    return root
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_discover_repositories(workspace, jobs):
+    repos = set(discover_repositories(workspace, jobs=jobs))
+    assert repos == {os.path.join(workspace, p) for p in ('a', 'b', 'b/module', 'c/d/e')}
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_discover_repositories_deep(workspace, jobs):
+    repos = set(discover_repositories(workspace, deep=True, jobs=jobs))
+    assert repos == {os.path.join(workspace, p) for p in ('a', 'a/nested', 'b', 'b/module', 'c/d/e')}
+
+
+def test_discover_repositories_early_exit(workspace):
+    repos = discover_repositories(workspace, jobs=4)
+    assert next(repos) is not None
+    repos.close()
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_prune_rules(workspace, jobs):
+    _make_repo(os.path.join(workspace, 'c', 'target', 'ignored'))
+    _make_repo(os.path.join(workspace, 'bazel-out', 'ignored'))
+
+    stats = ScanStats()
+    scanner = Scanner(workspace, rules=ScanRules(prune=('target', 'bazel-*', 'c/d')), stats=stats)
+    repos = set(discover_repositories(workspace, jobs=jobs, scan=scanner))
+    assert repos == {os.path.join(workspace, p) for p in ('a', 'b', 'b/module')}
+    assert stats.pruned == 4  # including node_modules
+
+
+@pytest.mark.parametrize('max_depth,expected', [(0, set()), (1, {'a', 'b'}), (2, {'a', 'b', 'b/module'})])
+def test_max_depth(workspace, max_depth, expected):
+    repos = set(discover_repositories(workspace, jobs=1, rules=ScanRules(max_depth=max_depth)))
+    assert repos == {os.path.join(workspace, p) for p in expected}
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_symlink_loop(workspace, jobs):
+    os.symlink(workspace, os.path.join(workspace, 'c', 'loop'))
+
+    stats = ScanStats()
+    repos = list(discover_repositories(workspace, jobs=jobs, scan=Scanner(workspace, stats=stats)))
+    assert sorted(repos) == sorted(os.path.join(workspace, p) for p in ('a', 'b', 'b/module', 'c/d/e'))
+    assert stats.loops == 1
@@ -0,0 +1,78 @@
+import argparse
+import os
+
+import pytest
+
+from accoutrements.cmd.ditto import DittoConfigResolver, TARGET_FILENAME, run_sync
+from accoutrements.discovery import ScanRules
+
+
+def _write_config(folder, contents):
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, TARGET_FILENAME), 'w') as cfg_file:
+        cfg_file.write(contents)
+
+
+def test_nearest_config(tmp_path):
+    root = str(tmp_path)
+    _write_config(os.path.join(root, 'Code'), '[user]\nname = "Home"\nemail = "home@example.com"\n')
+    _write_config(os.path.join(root, 'Code', 'Work'), '[user]\nemail = "work@example.com"\n')
+    _write_config(os.path.join(root, 'Code', 'Work', 'clientX'),
+                  'inherit = true\n[user]\nsigningkey = "ABCD"\n')
+
+    resolver = DittoConfigResolver()
+
+    cfg = resolver.resolve(os.path.join(root, 'Code', 'personal', 'repo'))
+    assert (cfg.name, cfg.email, cfg.signing_key) == ('Home', 'home@example.com', None)
+
+    # without inheritance the nearest config is used as is
+    cfg = resolver.resolve(os.path.join(root, 'Code', 'Work', 'repo'))
+    assert (cfg.name, cfg.email, cfg.signing_key) == (None, 'work@example.com', None)
+
+    # with inheritance the missing values are filled in from the parent folders
+    cfg = resolver.resolve(os.path.join(root, 'Code', 'Work', 'clientX', 'a', 'repo'))
+    assert (cfg.name, cfg.email, cfg.signing_key) == (None, 'work@example.com', 'ABCD')
+
+    assert resolver.find(os.path.join(root, 'Code', 'Work', 'clientX', 'b')) == \
+        os.path.join(root, 'Code', 'Work', 'clientX', TARGET_FILENAME)
+
+
+def test_scan_rules(tmp_path):
+    root = str(tmp_path)
+    _write_config(root, '[scan]\nprune = [".venv", "bazel-*"]\nmax_depth = 4\n')
+
+    resolver = DittoConfigResolver()
+    assert resolver.scan_rules(os.path.join(root, 'Code')) == ScanRules(prune=('.venv', 'bazel-*'), max_depth=4)
+
+
+def _make_remote(git, root, path):
+    work = path + '-work'
+    git(root, 'init', '-q', '--bare', path)
+    git(root, 'clone', '-q', path, work)
+    git(work, 'commit', '-q', '--allow-empty', '-m', 'initial')
+    git(work, 'push', '-q', 'origin', 'HEAD')
+    return 'file://' + path
+
+
+@pytest.mark.parametrize('reference', [None, 'cache.git'])
+def test_sync(tmp_path, monkeypatch, git, reference):
+    root = str(tmp_path)
+    urls = [_make_remote(git, root, os.path.join(root, 'remotes', name)) for name in ('service-a.git', 'service-b.git')]
+
+    workspace = os.path.join(root, 'workspace')
+    contents = '[user]\nname = "Work"\n\n'
+    contents += f'[[repos]]\nurl = "{urls[0]}"\n\n[[repos]]\nurl = "{urls[1]}"\npath = "team/b"\n'
+    _write_config(workspace, contents)
+
+    monkeypatch.chdir(workspace)
+    args = argparse.Namespace(jobs=4, reference=reference, dissociate=None)
+    run_sync(args, DittoConfigResolver())
+
+    for path in ('service-a', os.path.join('team', 'b')):
+        assert git(os.path.join(workspace, path), 'config', 'user.name') == 'Work'
+
+        alternates = os.path.join(workspace, path, '.git', 'objects', 'info', 'alternates')
+        assert os.path.exists(alternates) == (reference is not None)
+
+    # the existing clones are left alone
+    run_sync(args, DittoConfigResolver())
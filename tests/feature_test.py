@@ -0,0 +1,81 @@
+import argparse
+import os
+import subprocess
+
+import pytest
+
+from accoutrements.cmd.feature import create_new_branch
+from accoutrements.gitdir import GitDirectory
+from accoutrements.refs import invalidate_ref_snapshot
+
+
+def _args(*name, worktree=None, sparse=None):
+    return argparse.Namespace(name=list(name), push=False, worktree=worktree, sparse=sparse)
+
+
+@pytest.fixture
+def clone(clone, git, monkeypatch):
+    with open(os.path.join(clone, 'README'), 'w') as readme:
+        readme.write('initial\n')
+    git(clone, 'add', 'README')
+    git(clone, 'commit', '-q', '-m', 'readme')
+    git(clone, 'push', '-q', 'origin', 'main')
+
+    # develop moves on upstream, while the local checkout stays on main
+    git(clone, 'checkout', '-q', '-b', 'develop')
+    git(clone, 'commit', '-q', '--allow-empty', '-m', 'develop')
+    git(clone, 'push', '-q', 'origin', 'develop')
+    git(clone, 'checkout', '-q', 'main')
+
+    monkeypatch.chdir(clone)
+    invalidate_ref_snapshot()
+    return clone
+
+
+def test_clean_tree_starts_from_remote_target(clone, git):
+    create_new_branch('feature', _args('new', 'thing'))
+
+    assert git(clone, 'branch', '--show-current') == 'feature/new-thing'
+    assert git(clone, 'rev-parse', 'HEAD') == git(clone, 'rev-parse', 'origin/develop')
+    assert subprocess.call(['git', 'config', 'branch.feature/new-thing.merge'], cwd=clone) == 1  # not tracking
+
+
+def test_working_changes_are_kept(clone, git):
+    with open(os.path.join(clone, 'README'), 'w') as readme:
+        readme.write('changed\n')
+    git(clone, 'add', 'README')
+
+    create_new_branch('bugfix', _args('fix'))
+
+    assert git(clone, 'branch', '--show-current') == 'bugfix/fix'
+    assert git(clone, 'rev-parse', 'HEAD') == git(clone, 'rev-parse', 'main')
+    assert git(clone, 'diff', '--cached', '--name-only') == 'README'
+
+
+def test_worktree(clone, git):
+    create_new_branch('feature', _args('parallel', worktree=''))
+
+    path = f'{clone}-feature-parallel'
+    assert git(clone, 'branch', '--show-current') == 'main'
+    assert git(path, 'branch', '--show-current') == 'feature/parallel'
+    assert git(path, 'rev-parse', 'HEAD') == git(clone, 'rev-parse', 'origin/develop')
+
+
+def test_sparse_worktree(clone, tmp_path, git):
+    for folder in ('docs', 'src'):
+        os.makedirs(os.path.join(clone, folder))
+        with open(os.path.join(clone, folder, 'index.md'), 'w') as index:
+            index.write(f'{folder}\n')
+    git(clone, 'add', 'docs', 'src')
+    git(clone, 'commit', '-q', '-m', 'docs')
+    git(clone, 'push', '-q', '-f', 'origin', 'main:develop')
+    git(clone, 'config', '--add', 'sparse-profile.docs.path', 'docs')
+
+    path = str(tmp_path / 'sparse')
+    create_new_branch('chore', _args('sparse', worktree=path, sparse='docs'))
+
+    assert sorted(os.listdir(path)) == ['.git', 'README', 'docs']
+    assert git(path, 'status', '--porcelain') == ''
+
+    # the worktree config enabled by sparse-checkout does not stop the repository being read in-process
+    assert GitDirectory.open(clone).head() == 'main'
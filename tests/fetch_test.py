@@ -0,0 +1,24 @@
+from accoutrements.fetch import FETCH_FINGERPRINT_ENV, fetch_remotes
+
+
+def test_ttl(clone, capsys):
+    assert fetch_remotes(['origin'], cwd=clone) == ['origin']
+
+    # fetched a moment ago, so only a zero TTL fetches it again
+    assert fetch_remotes(['origin'], ttl=60, cwd=clone) == []
+    assert 'Skipping fetch of up to date remotes: origin' in capsys.readouterr().out
+    assert fetch_remotes(['origin'], ttl=0, cwd=clone) == ['origin']
+    assert fetch_remotes(['origin'], force=True, cwd=clone) == ['origin']
+
+
+def test_fingerprint(clone, remote, git, monkeypatch):
+    monkeypatch.setenv(FETCH_FINGERPRINT_ENV, '1')
+    assert fetch_remotes(['origin'], ttl=0, cwd=clone) == ['origin']
+
+    # past the TTL, but nothing has changed on the remote
+    assert fetch_remotes(['origin'], ttl=0, cwd=clone) == []
+
+    git(remote, 'branch', 'feature/moved', 'main')
+    assert fetch_remotes(['origin'], ttl=0, cwd=clone) == ['origin']
+    assert git(clone, 'rev-parse', 'origin/feature/moved') == git(clone, 'rev-parse', 'main')
+    assert fetch_remotes(['origin'], ttl=0, cwd=clone) == []
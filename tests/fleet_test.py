@@ -0,0 +1,48 @@
+import argparse
+import os
+import re
+import sys
+
+import pytest
+
+from accoutrements.cmd.fleet import build_command, main
+
+
+def _args(operation, yes=False, fetch=False):
+    return argparse.Namespace(operation=operation, yes=yes, fetch=fetch)
+
+
+def test_build_command():
+    assert build_command(_args('fetch', fetch=True)) == [sys.executable, '-m', 'accoutrements', 'fetch']
+    assert build_command(_args('master', fetch=True)) == [sys.executable, '-m', 'accoutrements', 'master', '--fetch']
+
+    # tidy is never run interactively, without --yes it only reports
+    assert build_command(_args('tidy'))[-2:] == ['tidy', '--dry-run']
+    assert build_command(_args('tidy', yes=True))[-2:] == ['tidy', '--yes']
+
+
+def test_fleet(clone, remote, git, tmp_path, monkeypatch, capsys):
+    workspace = str(tmp_path / 'workspace')
+    for name in ('ok', 'broken'):
+        git(str(tmp_path), 'clone', '-q', remote, os.path.join(workspace, 'team', name))
+    git(os.path.join(workspace, 'team', 'broken'), 'remote', 'set-url', 'origin', str(tmp_path / 'missing.git'))
+
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('PYTHONPATH', os.pathsep.join(sys.path))  # each repository runs `python -m accoutrements`
+    monkeypatch.setattr(sys, 'argv', ['git-fleet', 'fetch', workspace])
+
+    with pytest.raises(SystemExit) as ex:
+        main()
+
+    assert ex.value.code == 1
+    lines = re.sub(r'\x1b\[[0-9;]*m', '', capsys.readouterr().out).splitlines()
+    assert [line.split()[1:] for line in lines if line.endswith(('/ok', '/broken'))] == [
+        ['failed', os.path.join(workspace, 'team', 'broken')],
+        ['ok', os.path.join(workspace, 'team', 'ok')],
+    ]
+    assert '2 repositories, 1 ok, 1 failed' in lines
+
+    # the fetch goes through the same freshness check as the other commands, so the repeat is skipped
+    monkeypatch.setattr(sys, 'argv', ['git-fleet', 'fetch', os.path.join(workspace, 'team', 'ok'), '--verbose'])
+    main()
+    assert 'Skipping fetch of up to date remotes: origin' in capsys.readouterr().out
@@ -0,0 +1,114 @@
+import os
+import subprocess
+
+import pytest
+
+from accoutrements.gitdir import GitDirectory, UnsupportedLayout, find_git_dirs
+from accoutrements.refs import REF_FORMAT
+
+
+@pytest.fixture
+def clone(clone, remote, git):
+    for branch in ('feature/a', 'feature/b', 'chore/c'):
+        git(clone, 'checkout', '-q', '-b', branch, 'main')
+        git(clone, 'commit', '-q', '--allow-empty', '-m', branch)
+    git(clone, 'push', '-q', '-u', 'origin', 'feature/a', 'feature/b', 'chore/c')
+    git(clone, 'remote', 'add', 'team/fork', remote)
+    git(clone, 'fetch', '-q', 'team/fork')
+    git(clone, 'remote', 'set-head', 'origin', 'main')
+    git(clone, 'tag', '-a', 'v1.0.0', '-m', 'v1.0.0')
+
+    # a mix of packed and loose refs, with one of the upstream branches removed
+    git(clone, 'pack-refs', '--all')
+    git(clone, 'checkout', '-q', 'main')
+    git(clone, 'commit', '-q', '--allow-empty', '-m', 'loose')
+    git(clone, 'branch', 'local-only')
+    git(clone, 'branch', '--set-upstream-to=main', 'local-only')
+    git(remote, 'branch', '-D', 'feature/b')
+    git(clone, 'fetch', '-q', '--prune', 'origin')
+
+    return clone
+
+
+def _cli_refs(git, cwd):
+    output = git(cwd, 'for-each-ref', f'--format={REF_FORMAT}')
+    return [tuple(line.split('\0')) for line in output.splitlines()]
+
+
+def test_matches_cli(clone, git):
+    git_dir = GitDirectory.open(clone)
+
+    assert git_dir.remotes() == sorted(git(clone, 'remote').split())
+    assert list(git_dir.ref_entries()) == _cli_refs(git, clone)
+    assert git_dir.head() == 'main'
+    assert git_dir.upstream('feature/b') == 'refs/remotes/origin/feature/b'
+    assert git_dir.upstream('local-only') == 'refs/heads/main'
+
+    git(clone, 'checkout', '-q', '--detach')
+    assert git_dir.head() is None
+
+
+def test_branches_and_lookups(clone, git):
+    git_dir = GitDirectory.open(clone)
+
+    cli_branches = git(clone, 'for-each-ref', '--format=%(refname:lstrip=2)', 'refs/heads/').splitlines()
+    assert list(git_dir.iter_branches()) == cli_branches
+
+    # packed (including peeled tags), loose and missing refs
+    for refname, _, _ in _cli_refs(git, clone):
+        assert git_dir.has_ref(refname), refname
+    for refname in ('refs/remotes/origin/feature/b', 'refs/heads/feature', 'refs/heads/zzz', 'refs/aaa'):
+        assert not git_dir.has_ref(refname), refname
+
+
+def test_packed_ref_lookups(clone, git):
+    names = [f'refs/heads/bulk/{index:04d}' for index in range(0, 500, 2)]
+    stdin = ''.join(f'create {name} HEAD\n' for name in names)
+    subprocess.run(['git', 'update-ref', '--stdin'], input=stdin.encode(), cwd=clone, check=True)
+    git(clone, 'pack-refs', '--all')
+
+    git_dir = GitDirectory.open(clone)
+    assert all(git_dir.has_ref(name) for name in names)
+    assert not any(git_dir.has_ref(f'refs/heads/bulk/{index:04d}') for index in range(1, 500, 2))
+    assert [name for name in git_dir.iter_branches() if name.startswith('bulk/')] == [n[11:] for n in names]
+
+
+def test_worktree(clone, tmp_path, git):
+    worktree = str(tmp_path / 'worktree')
+    git(clone, 'worktree', 'add', '-q', worktree, 'feature/a')
+
+    subfolder = os.path.join(worktree, 'sub')
+    os.makedirs(subfolder)
+    git_dir, common_dir = find_git_dirs(subfolder)
+    assert common_dir == os.path.join(clone, '.git')
+    assert git_dir == os.path.join(clone, '.git', 'worktrees', 'worktree')
+
+    git_dir = GitDirectory.open(subfolder)
+    assert git_dir.head() == 'feature/a'
+    assert list(git_dir.ref_entries()) == _cli_refs(git, subfolder)
+
+
+def test_worktree_config(clone, tmp_path, git):
+    worktree = str(tmp_path / 'sparse')
+    git(clone, 'worktree', 'add', '-q', worktree, 'feature/a')
+    git(worktree, 'sparse-checkout', 'set', 'docs')
+    git(worktree, 'config', '--worktree', 'user.name', 'Worktree User')
+
+    # the repository is still read in-process, with the worktree config only applying to its own worktree
+    assert git(clone, 'config', 'extensions.worktreeConfig') == 'true'
+    assert GitDirectory.open(worktree).config_value('user.name') == 'Worktree User'
+    assert GitDirectory.open(worktree).config_value('core.sparsecheckout') == 'true'
+    assert GitDirectory.open(clone).config_value('core.sparsecheckout') is None
+
+
+def test_unsupported_layouts(clone, monkeypatch, git):
+    with pytest.raises(UnsupportedLayout):
+        find_git_dirs(os.path.join(clone, '.git', 'refs'))
+
+    git(clone, 'config', 'include.path', 'other.config')
+    with pytest.raises(UnsupportedLayout):
+        GitDirectory.open(clone)
+
+    monkeypatch.setenv('GIT_DIR', os.path.join(clone, '.git'))
+    with pytest.raises(UnsupportedLayout):
+        find_git_dirs(clone)
@@ -0,0 +1,66 @@
+import sys
+
+import pytest
+
+from accoutrements.cmd import master
+from accoutrements.refs import invalidate_ref_snapshot
+
+
+@pytest.fixture
+def clone(clone, git, monkeypatch):
+    monkeypatch.setenv('ACCOUTREMENTS_DAEMON', '0')
+
+    git(clone, 'push', '-q', 'origin', 'main:develop')
+    git(clone, 'branch', 'develop', 'origin/develop')
+
+    # both branches move on upstream while a feature branch is checked out
+    git(clone, 'checkout', '-q', '-b', 'feature/thing')
+    git(clone, 'commit', '-q', '--allow-empty', '-m', 'upstream')
+    git(clone, 'push', '-q', 'origin', 'HEAD:main', 'HEAD:develop')
+    git(clone, 'commit', '-q', '--allow-empty', '-m', 'feature')
+
+    monkeypatch.chdir(clone)
+    monkeypatch.setattr(sys, 'argv', ['git-master', '--no-checkout'])
+    invalidate_ref_snapshot()
+    return clone
+
+
+def test_no_checkout(clone, git):
+    head = git(clone, 'rev-parse', 'HEAD')
+    master.main()
+
+    assert git(clone, 'rev-parse', 'main') == git(clone, 'rev-parse', 'origin/main')
+    assert git(clone, 'rev-parse', 'develop') == git(clone, 'rev-parse', 'origin/develop')
+    assert git(clone, 'branch', '--show-current') == 'feature/thing'
+    assert git(clone, 'rev-parse', 'HEAD') == head
+
+
+def test_no_checkout_refuses_non_fast_forward(clone, git):
+    git(clone, 'branch', '-f', 'develop', 'HEAD')  # develop now has a commit that is not upstream
+    develop = git(clone, 'rev-parse', 'develop')
+
+    with pytest.raises(SystemExit):
+        master.main()
+
+    assert git(clone, 'rev-parse', 'main') == git(clone, 'rev-parse', 'origin/main')
+    assert git(clone, 'rev-parse', 'develop') == develop
+
+
+def test_no_checkout_skips_checked_out_branch(clone, git):
+    git(clone, 'checkout', '-q', 'develop')
+    develop = git(clone, 'rev-parse', 'develop')
+
+    master.main()
+
+    assert git(clone, 'rev-parse', 'main') == git(clone, 'rev-parse', 'origin/main')
+    assert git(clone, 'rev-parse', 'develop') == develop
+    assert git(clone, 'status', '--porcelain') == ''
+
+
+def test_no_checkout_creates_missing_master(clone, git):
+    git(clone, 'branch', '-D', 'main')
+
+    master.main()
+
+    assert git(clone, 'rev-parse', 'main') == git(clone, 'rev-parse', 'origin/main')
+    assert git(clone, 'rev-parse', '--abbrev-ref', 'main@{upstream}') == 'origin/main'
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from accoutrements import detect_master_branch, find_master_branch, invalidate_ref_snapshot, runner
+from accoutrements.metadata import clear_metadata, load_metadata
+
+
+@pytest.fixture(autouse=True)
+def isolated_config(tmp_path, monkeypatch):
+    # the signing key must not come from the config of the user running the tests
+    monkeypatch.setenv('GIT_CONFIG_GLOBAL', str(tmp_path / 'gitconfig'))
+    monkeypatch.setenv('GIT_CONFIG_NOSYSTEM', '1')
+
+
+def _spawned(monkeypatch):
+    calls = []
+    original = runner.run
+
+    def run(cmd, *args, **kwargs):
+        calls.append(cmd)
+        return original(cmd, *args, **kwargs)
+
+    monkeypatch.setattr(runner, 'run', run)
+    return calls
+
+
+def test_metadata(clone):
+    metadata = load_metadata(clone)
+    assert (metadata.remote, metadata.master, metadata.develop, metadata.signing_key) == ('origin', 'main', None, False)
+    assert os.path.isfile(os.path.join(clone, '.git', 'accoutrements', 'metadata.json'))
+
+    # a new process reads the stored values
+    metadata = load_metadata(clone)
+    assert all(metadata.is_fresh(section) for section in ('remote', 'branches', 'signing_key'))
+    assert metadata.values('branches') == {'master': 'main', 'develop': None}
+
+    assert clear_metadata(clone)
+    assert load_metadata(clone).values('remote') is None
+
+
+def test_invalidated_by_changes(clone, git):
+    assert load_metadata(clone).develop is None
+
+    git(clone, 'push', '-q', 'origin', 'main:develop')
+    invalidate_ref_snapshot()
+    metadata = load_metadata(clone)
+    assert not metadata.is_fresh('branches')
+    assert metadata.is_fresh('remote')
+    assert metadata.develop == 'develop'
+
+    git(clone, 'config', 'user.signingkey', 'ABCDEF')
+    assert load_metadata(clone).signing_key
+
+
+def test_remote_default_branch(clone, remote, git, monkeypatch):
+    git(clone, 'push', '-q', 'origin', 'main:production')
+    git(clone, 'push', '-q', 'origin', '--delete', 'main')
+    git(remote, 'symbolic-ref', 'HEAD', 'refs/heads/production')
+    git(clone, 'fetch', '-q', '--prune')
+    invalidate_ref_snapshot()
+
+    # nothing is recorded locally, so the server is asked once and the answer is remembered
+    calls = _spawned(monkeypatch)
+    assert detect_master_branch('origin', cwd=clone) == 'production'
+    assert detect_master_branch('origin', cwd=clone) == 'production'
+    assert [cmd[1] for cmd in calls] == ['ls-remote']
+
+    git(clone, 'remote', 'set-head', 'origin', 'production')
+    calls.clear()
+    assert find_master_branch('origin', cwd=clone) == 'production'
+    assert calls == []
@@ -0,0 +1,73 @@
+import pytest
+
+from accoutrements.gitdir import GitDirectory, UnsupportedLayout
+from accoutrements.refs import RefSnapshot, delete_local_branches, iter_stale_branches
+
+
+def _build_snapshot():
+    return RefSnapshot(['origin', 'origin/mirror'], [
+        ('refs/heads/master', 'a' * 40, 'refs/remotes/origin/master'),
+        ('refs/heads/feature/gone', 'b' * 40, 'refs/remotes/origin/feature/gone'),
+        ('refs/heads/local-only', 'c' * 40, ''),
+        ('refs/remotes/origin/HEAD', 'a' * 40, ''),
+        ('refs/remotes/origin/master', 'a' * 40, ''),
+        ('refs/remotes/origin/feature/nested/name', 'd' * 40, ''),
+        ('refs/remotes/origin/mirror/develop', 'e' * 40, ''),
+        ('refs/tags/v1.0.0', 'f' * 40, ''),
+    ])
+
+
+def test_remote_branches_with_slashes():
+    snapshot = _build_snapshot()
+    assert snapshot.remote_branches('origin') == {'master', 'feature/nested/name'}
+    assert snapshot.remote_branches('origin/mirror') == {'develop'}
+    assert snapshot.remote_branches('unknown') == set()
+
+
+def test_local_branches():
+    snapshot = _build_snapshot()
+    assert snapshot.local_branches == {'master', 'feature/gone', 'local-only'}
+
+
+def test_resolve():
+    snapshot = _build_snapshot()
+    assert snapshot.resolve('refs/tags/v1.0.0') == 'f' * 40
+    assert snapshot.resolve('refs/tags/v2.0.0') is None
+    assert snapshot.upstream('local-only') is None
+
+
+@pytest.mark.parametrize('in_process', [True, False])
+def test_iter_stale_branches(clone, git, monkeypatch, in_process):
+    for branch in ('feature/gone', 'chore/kept', 'untracked'):
+        git(clone, 'branch', '-f', branch)
+    git(clone, 'push', '-q', 'origin', 'feature/gone', 'chore/kept')
+    git(clone, 'branch', '-u', 'origin/feature/gone', 'feature/gone')
+    git(clone, 'branch', '-u', 'origin/chore/kept', 'chore/kept')
+    git(clone, 'push', '-q', 'origin', '--delete', 'feature/gone')
+    git(clone, 'fetch', '-q', '--prune')
+
+    if in_process:
+        # the in-process path only looks at the local branches and their upstreams
+        monkeypatch.setattr(GitDirectory, 'read_refs', None)
+    else:
+        # includes are left to git, so the branches are streamed from for-each-ref instead
+        git(clone, 'config', 'include.path', 'other.config')
+        with pytest.raises(UnsupportedLayout):
+            GitDirectory.open(clone)
+    assert set(iter_stale_branches(cwd=clone)) == {'feature/gone'}
+
+
+def test_delete_local_branches_keeps_checked_out(clone, git, tmp_path):
+    git(clone, 'checkout', '-q', '-b', 'current')
+    for branch in ('linked', 'unused'):
+        git(clone, 'branch', branch)
+    git(clone, 'worktree', 'add', '-q', str(tmp_path / 'linked'), 'linked')
+
+    results = delete_local_branches(['current', 'linked', 'unused', 'missing'], cwd=clone)
+    assert results == {
+        'current': f'checked out at {clone}',
+        'linked': f'checked out at {tmp_path / "linked"}',
+        'unused': None,
+        'missing': 'branch not found',
+    }
+    assert git(clone, 'branch', '--show-current') == 'current'
@@ -0,0 +1,120 @@
+import argparse
+import os
+import sys
+
+import pytest
+
+from accoutrements.cmd.rel import main, run_batch_release
+from accoutrements.release_notes import generate_release_notes, parse_merge_subject
+from accoutrements.tags import previous_release
+
+
+def _make_repo(git, root, name, tag):
+    remote = os.path.join(root, f'{name}.git')
+    clone = os.path.join(root, name)
+    git(root, 'init', '-q', '--bare', remote)
+    git(root, 'clone', '-q', remote, clone)
+    git(clone, 'commit', '-q', '--allow-empty', '-m', 'initial')
+    git(clone, 'branch', '-M', 'main')
+    git(clone, 'tag', tag)
+    return remote, clone
+
+
+def _args(manifest):
+    return argparse.Namespace(manifest=manifest, jobs=4, dry_run=False, yes=True, no_push=False)
+
+
+@pytest.fixture
+def workspace(tmp_path, git):
+    root = str(tmp_path)
+    repos = [_make_repo(git, root, 'service-a', 'v1.2.3'), _make_repo(git, root, 'service-b', 'v0.4.0')]
+
+    manifest = os.path.join(root, 'release.toml')
+    with open(manifest, 'w') as manifest_file:
+        manifest_file.write('[[repos]]\npath = "service-a"\nmode = "minor"\n\n[[repos]]\npath = "service-b"\n')
+
+    return manifest, repos
+
+
+def test_batch_release(workspace, git):
+    manifest, [(remote_a, clone_a), (remote_b, clone_b)] = workspace
+
+    run_batch_release(_args(manifest))
+
+    assert 'v1.3.0' in git(remote_a, 'tag').splitlines()
+    assert 'v0.4.1' in git(remote_b, 'tag').splitlines()
+
+
+def test_batch_release_is_checked_up_front(workspace, git):
+    manifest, [(remote_a, clone_a), (remote_b, clone_b)] = workspace
+    with open(manifest, 'a') as manifest_file:
+        manifest_file.write('\n[[repos]]\npath = "service-b"\nmode = "v0.4.0"\n')
+
+    # one of the tags already exists, so nothing is created anywhere
+    with pytest.raises(SystemExit):
+        run_batch_release(_args(manifest))
+
+    assert git(clone_a, 'tag').splitlines() == ['v1.2.3']
+
+
+def test_batch_release_push_failure(workspace, git):
+    manifest, [(remote_a, clone_a), (remote_b, clone_b)] = workspace
+    git(clone_b, 'remote', 'set-url', 'origin', os.path.join(os.path.dirname(remote_b), 'missing.git'))
+
+    with pytest.raises(SystemExit):
+        run_batch_release(_args(manifest))
+
+    # the repository that failed to push is left without the local tag, so it can be released again
+    assert 'v1.3.0' in git(remote_a, 'tag').splitlines()
+    assert 'v0.4.1' not in git(clone_b, 'tag').splitlines()
+
+
+def test_release_notes(workspace, monkeypatch, git):
+    manifest, [(remote_a, clone_a), _] = workspace
+    for branch in ('feature/login', 'bugfix/crash', 'chore/deps', 'feature/logout', 'experiment'):
+        git(clone_a, 'checkout', '-q', '-b', branch, 'main')
+        git(clone_a, 'commit', '-q', '--allow-empty', '-m', f'work on {branch}')
+        git(clone_a, 'checkout', '-q', 'main')
+        git(clone_a, 'merge', '-q', '--no-ff', '--no-edit', branch)
+    git(clone_a, 'commit', '-q', '--allow-empty', '-m', 'Not a merge of feature/other')
+
+    notes = generate_release_notes('v1.2.3', cwd=clone_a)
+    assert notes.format() == '\n'.join([
+        'Features:', '- logout', '- login', '',
+        'Bug fixes:', '- crash', '',
+        'Chores:', '- deps', '',
+        "Other changes:", "- Merge branch 'experiment'",
+    ])
+
+    monkeypatch.setattr(sys, 'argv', ['git-rel', 'minor', '-w', clone_a, '--yes', '--no-push', '--notes-in-tag'])
+    main()
+    message = git(clone_a, 'tag', '-l', '--format=%(contents)', 'v1.3.0')
+    assert message.startswith('v1.3.0\n\nFeatures:\n- logout\n- login\n')
+
+
+def test_release_notes_on_maintenance_branch(workspace, monkeypatch, capsys, git):
+    manifest, [(remote_a, clone_a), _] = workspace
+    for target, branch in (('main', 'feature/login'), ('maint/1.2', 'bugfix/crash')):
+        if target == 'maint/1.2':
+            git(clone_a, 'tag', 'v1.3.0')
+            git(clone_a, 'checkout', '-q', '-b', target, 'v1.2.3')
+        git(clone_a, 'checkout', '-q', '-b', branch, target)
+        git(clone_a, 'commit', '-q', '--allow-empty', '-m', f'work on {branch}')
+        git(clone_a, 'checkout', '-q', target)
+        git(clone_a, 'merge', '-q', '--no-ff', '--no-edit', branch)
+
+    # v1.3.0 is the highest release, but the maintenance branch follows on from v1.2.3
+    assert previous_release(cwd=clone_a) == 'v1.2.3'
+
+    monkeypatch.setattr(sys, 'argv', ['git-rel', 'patch', '-w', clone_a, '--yes', '--dry-run', '--notes'])
+    main()
+    output = capsys.readouterr().out
+    assert 'Bug fixes:\n- crash\n' in output
+    assert 'login' not in output
+
+
+def test_parse_merge_subject():
+    assert parse_merge_subject('Merge pull request #12 from someone/feature/search') == ('feature', 'search (#12)')
+    assert parse_merge_subject("Merge branch 'bugfix/crash' into develop") == ('bugfix', 'crash')
+    assert parse_merge_subject("Merge remote-tracking branch 'origin/chore/deps'") == ('chore', 'deps')
+    assert parse_merge_subject('Merge branch featured') == (None, 'Merge branch featured')
@@ -0,0 +1,57 @@
+import atexit
+import json
+
+import pytest
+
+from accoutrements import runner
+
+
+@pytest.fixture(autouse=True)
+def tracer():
+    yield
+
+    # the summary of the tracers used by the tests should not be printed when pytest exits
+    runner._Tracer.reset()
+    atexit.unregister(runner._Tracer.print_at_exit)
+
+
+@pytest.mark.parametrize('cmd,expected', [
+    (['git', 'fetch', 'origin'], 'fetch'),
+    (['git', '-c', 'core.fsmonitor=true', 'status'], 'status'),
+    (['git', '-C', '/tmp', '--no-pager', 'log'], 'log'),
+    (['git'], 'git'),
+    (['/usr/bin/python3', '-m', 'accoutrements'], 'python3'),
+])
+def test_subcommand(cmd, expected):
+    assert runner.subcommand(cmd) == expected
+
+
+def test_trace(tmp_path, monkeypatch):
+    trace_path = str(tmp_path / 'trace.ndjson')
+    monkeypatch.setenv(runner.TRACE_ENV, trace_path)
+
+    assert runner.check_output(['git', '--version']).startswith(b'git version')
+    with runner.stream(['git', '--version']) as lines:
+        assert len(list(lines)) == 1
+    with pytest.raises(runner.CalledProcessError):
+        runner.check_call(['git', 'not-a-real-command'], stderr=runner.DEVNULL)
+
+    with open(trace_path) as trace_file:
+        entries = [json.loads(line) for line in trace_file]
+
+    assert [entry['argv'][1] for entry in entries] == ['--version', '--version', 'not-a-real-command']
+    assert [entry['returncode'] for entry in entries] == [0, 0, 1]
+    assert entries[0]['output_bytes'] == entries[1]['output_bytes'] > 0
+    assert entries[2]['output_bytes'] is None
+
+
+def test_trace_summary(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv(runner.TRACE_ENV, str(tmp_path / 'trace.ndjson'))
+
+    runner.check_output(['git', '--version'])
+    runner.call(['git', 'not-a-real-command'], stderr=runner.DEVNULL)
+    runner._Tracer.get().print_summary()
+
+    lines = capsys.readouterr().err.splitlines()
+    assert lines[1].startswith('Trace summary (2 calls')
+    assert len({line.index(' calls') for line in lines[2:]}) == 1  # the columns line up
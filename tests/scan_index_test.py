@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from accoutrements import scan_index
+from accoutrements.discovery import discover_repositories, scan_directory
+from accoutrements.scan_index import ScanIndex
+
+
+@pytest.fixture(autouse=True)
+def no_racy_window(monkeypatch):
+    monkeypatch.setattr(scan_index, 'RACY_WINDOW_NS', 0)
+
+
+def _scan(index_path, root, rebuild=False):
+    index = ScanIndex.load(index_path, 'test', rebuild=rebuild)
+    repos = set(discover_repositories(root, jobs=1, scan=index.wrap(scan_directory)))
+    index.save()
+    return index, repos
+
+
+def test_warm_scan(tmp_path):
+    root = str(tmp_path / 'workspace')
+    index_path = str(tmp_path / 'index.json')
+    os.makedirs(os.path.join(root, 'a', '.git'))
+    os.makedirs(os.path.join(root, 'b', 'c', '.git'))
+
+    index, cold_repos = _scan(index_path, root)
+    assert index.hits == 0
+
+    index, warm_repos = _scan(index_path, root)
+    assert warm_repos == cold_repos
+    assert index.misses == 0
+
+    # adding a new checkout only changes the mtime of its parent folder
+    os.makedirs(os.path.join(root, 'b', 'd', '.git'))
+    index, repos = _scan(index_path, root)
+    assert repos == cold_repos | {os.path.join(root, 'b', 'd')}
+    assert index.misses == 2  # the changed parent and the new checkout
+
+    index, repos = _scan(index_path, root, rebuild=True)
+    assert index.hits == 0
@@ -0,0 +1,54 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from accoutrements.dispatch import COMMANDS
+
+# The budget for the additional import time (on top of the bare interpreter) of any single command. This is kept
+# generous so that it holds on slow CI machines, but is still well below the cost of importing colored / toml and the
+# rest of the command modules eagerly
+IMPORT_BUDGET_US = int(os.environ.get('ACCOUTREMENTS_IMPORT_BUDGET_US', 80000))
+
+# modules that must only be imported when a command actually needs them
+DEFERRED_MODULES = ('colored', 'toml', 'concurrent.futures', 'hashlib', 'asyncio')
+
+IMPORT_TIME_MATCHER = re.compile(r'^import time:\s+(\d+)\s+\|\s+\d+\s+\|\s+(\S+)$')
+
+
+def _import_times(code: str):
+    # measure with the bytecode cache enabled, as it would be for an installed package
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    cmd = [sys.executable, '-X', 'importtime', '-c', code]
+    output = subprocess.run(cmd, env=env, stderr=subprocess.PIPE, check=True).stderr.decode()
+
+    times = {}
+    for line in output.splitlines():
+        match = IMPORT_TIME_MATCHER.match(line)
+        if match is not None:
+            times[match.group(2)] = int(match.group(1))
+    return times
+
+
+@pytest.mark.parametrize('command', sorted(COMMANDS))
+def test_deferred_imports(command):
+    modules = _import_times(f'__import__({COMMANDS[command]!r})')
+    assert not any(module in modules for module in DEFERRED_MODULES)
+
+
+@pytest.mark.parametrize('command', sorted(COMMANDS))
+def test_import_budget(command):
+    baseline = _import_times('pass')
+    _import_times(f'__import__({COMMANDS[command]!r})')  # warm up the bytecode cache
+
+    # take the best of a few runs to reduce the noise from the rest of the machine
+    elapsed = min(
+        sum(us for module, us in _import_times(f'__import__({COMMANDS[command]!r})').items() if module not in baseline)
+        for _ in range(5)
+    )
+
+    assert elapsed < IMPORT_BUDGET_US, f'Importing {command} took {elapsed}us (budget {IMPORT_BUDGET_US}us)'
@@ -0,0 +1,30 @@
+from accoutrements.tags import load_tag_index, TAGS_STATE
+from accoutrements.state import load_state
+from accoutrements.versions import Version
+
+
+def test_tag_index(tmp_path, git):
+    repo = str(tmp_path)
+    git(repo, 'init', '-q')
+    git(repo, 'commit', '-q', '--allow-empty', '-m', 'first')
+    git(repo, 'tag', '-a', 'v1.10.0', '-m', 'v1.10.0')
+    git(repo, 'commit', '-q', '--allow-empty', '-m', 'second')
+    git(repo, 'tag', 'v1.9.2')
+    git(repo, 'tag', 'not-a-version')
+
+    index = load_tag_index(cwd=repo)
+    assert index.highest() == 'v1.10.0'
+    assert [name for _, name in index.versions] == ['v1.9.2', 'v1.10.0']
+    assert load_state(TAGS_STATE, cwd=repo)['tags'] == index.to_state()
+
+    # annotated tags are peeled to the commit that they point at
+    first = git(repo, 'rev-parse', 'HEAD~1')
+    assert ('v1.10.0', first, Version(1, 10, 0)) in index.tags
+
+    # the cached index is used until the tags change
+    assert load_tag_index(cwd=repo).tags == index.tags
+    git(repo, 'tag', 'v2.0.0-rc1')
+    assert load_tag_index(cwd=repo).highest() == 'v2.0.0-rc1'
+    git(repo, 'pack-refs', '--all')
+    git(repo, 'tag', '-d', 'v2.0.0-rc1')
+    assert load_tag_index(cwd=repo).highest() == 'v1.10.0'
@@ -1,6 +1,6 @@
 import pytest
 
-from accoutrements.versions import next_version
+from accoutrements.versions import next_version, parse_version, Version
 
 
 @pytest.mark.parametrize("curr_version,mode,expected", [
@@ -71,3 +71,20 @@ from accoutrements.versions import next_version
 ])
 def test_next_version(curr_version, mode, expected):
     assert next_version(curr_version, mode) == expected
+
+
+@pytest.mark.parametrize("text,expected", [
+    ('v1.2.3', Version(1, 2, 3)),
+    ('v1.2.3rc2', Version(1, 2, 3, 2, 2)),
+    ('v0.0.3-beta9', Version(0, 0, 3, 1, 9)),
+    ('v0.1.0-42-g008b8c7b', None),
+    ('release-1', None),
+])
+def test_parse_version(text, expected):
+    assert parse_version(text) == expected
+
+
+def test_version_order():
+    tags = ['v1.10.0', 'v1.2.0', 'v1.2.0-rc1', 'v1.2.0-alpha2', 'v1.2.0-alpha10', 'v0.9.9']
+    ordered = [str(version) for version in sorted(parse_version(tag) for tag in tags)]
+    assert ordered == ['v0.9.9', 'v1.2.0-alpha2', 'v1.2.0-alpha10', 'v1.2.0-rc1', 'v1.2.0', 'v1.10.0']
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+from accoutrements.cmd import tidy
+from accoutrements.refs import invalidate_ref_snapshot
+from accoutrements.worktrees import has_linked_worktrees, list_worktrees
+
+
+@pytest.fixture
+def clone(clone, git, tmp_path, monkeypatch):
+    monkeypatch.setenv('ACCOUTREMENTS_DAEMON', '0')
+
+    # two feature branches, each checked out in its own worktree, whose upstreams are then removed
+    for name in ('one', 'two'):
+        git(clone, 'worktree', 'add', '-q', '-b', f'feature/{name}', str(tmp_path / name))
+        git(str(tmp_path / name), 'push', '-q', '-u', 'origin', f'feature/{name}')
+        git(clone, 'push', '-q', 'origin', '--delete', f'feature/{name}')
+    git(clone, 'fetch', '-q', '--prune')
+    git(clone, 'worktree', 'lock', str(tmp_path / 'two'))
+
+    monkeypatch.chdir(clone)
+    invalidate_ref_snapshot()
+    return clone
+
+
+def test_list_worktrees(clone, tmp_path):
+    assert has_linked_worktrees()
+
+    worktrees = list_worktrees()
+    assert [(os.path.basename(w.path), w.branch, w.locked, w.main) for w in worktrees] == [
+        ('clone', 'main', False, True),
+        ('one', 'feature/one', False, False),
+        ('two', 'feature/two', True, False),
+    ]
+
+
+def test_tidy_removes_stale_worktrees(clone, tmp_path, monkeypatch, git):
+    monkeypatch.setattr(sys, 'argv', ['git-tidy', '--yes'])
+
+    # the locked worktree (and its branch) is kept
+    with pytest.raises(SystemExit):
+        tidy.main()
+
+    assert not os.path.exists(str(tmp_path / 'one'))
+    assert os.path.exists(str(tmp_path / 'two'))
+    assert git(clone, 'branch', '--list', 'feature/*') == '+ feature/two'